@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+#
+# Throughput of the receive path: escape decoder, terminal emulation and
+# console output, fed with synthetic streams.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Usage: python benchmarks/bench_pipeline.py [--output results.json] [--compare old.json]
+
+Targets:
+    decoder   EscapeDecoder with a handler that ignores all calls
+    terminal  EscapeDecoder + SimpleTerminal + console that discards output
+    console   EscapeDecoder + SimpleTerminal + console writing to a pty
+              (posix, drained by a thread) or to os.devnull
+    printable the Printable filter (see bench_printable.py)
+
+Reported: MB/s of input, decoder operations per second (text runs, control
+bytes and bytes in escape sequences), peak memory allocated per input byte
+(tracemalloc, in a separate run) and emulation errors (unsupported codes).
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+sys.path.append(str(pathlib.Path(__file__).parent))
+from serial_terminal.console.base import ConsoleBase  # noqa: E402
+from serial_terminal.emulation.simple import SimpleTerminal  # noqa: E402
+from serial_terminal.terminal.escape_decoder import EscapeDecoder  # noqa: E402
+from serial_terminal import metrics  # noqa: E402
+import streams  # noqa: E402
+import bench_printable  # noqa: E402
+
+CHUNK_SIZE = 256    # typical size of a read() at high baud rates
+
+
+class NullTerminal(object):
+    """accept all calls of the escape decoder and do nothing"""
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        pass
+
+
+class NullOutput(object):
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class SinkConsole(ConsoleBase):
+    """\
+    Console that tracks the cursor and writes ANSI sequences to the given
+    binary stream instead of the real terminal.
+    """
+
+    def __init__(self, byte_output, width=80, height=24):
+        self.byte_output = byte_output
+        self.output = TextOutput(byte_output)
+        self.width = width
+        self.height = height
+        self.x = self.y = 0
+
+    def write(self, text):
+        self.x = min(self.width - 1, self.x + len(text))
+        super().write(text)
+
+    def set_ansi_color(self, colorcodes):
+        self.byte_output.write('\x1b[{}m'.format(';'.join(str(c) for c in colorcodes)).encode('ascii'))
+
+    def get_position_and_size(self):
+        return self.x, self.y, self.width, self.height
+
+    def set_cursor_position(self, x, y):
+        self.x, self.y = x, y
+        self.byte_output.write('\x1b[{};{}H'.format(y + 1, x + 1).encode('ascii'))
+
+    def move_or_scroll_down(self):
+        self.y = min(self.height - 1, self.y + 1)
+        self.byte_output.write(b'\n')
+
+    def move_or_scroll_up(self):
+        self.y = max(0, self.y - 1)
+        self.byte_output.write(b'\x1bM')
+
+    def erase(self, x, y, width, height, selective=False):
+        self.byte_output.write(b'\x1b[K')
+
+
+class TextOutput(object):
+    """encode text for the binary sink (a TextIOWrapper would close it when collected)"""
+
+    def __init__(self, byte_output):
+        self.byte_output = byte_output
+
+    def write(self, text):
+        self.byte_output.write(text.encode('utf-8'))
+
+    def flush(self):
+        pass
+
+
+class PtySink(object):
+    """the writing side of a pty, the other side is read and discarded"""
+
+    def __init__(self):
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.output = os.fdopen(self.slave, 'wb', buffering=0)
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        try:
+            while os.read(self.master, 65536):
+                pass
+        except OSError:
+            pass
+
+    def close(self):
+        self.output.close()
+        os.close(self.master)
+
+
+class ErrorCounter(object):
+    """error handler for the decoder, only counts (keeping them would hold memory)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, exception):
+        self.count += 1
+
+
+def make_decoder(target, sink=None):
+    errors = ErrorCounter()
+    if target == 'decoder':
+        handler = NullTerminal()
+    else:
+        handler = SimpleTerminal(SinkConsole(sink if sink is not None else NullOutput()))
+    return EscapeDecoder(handler, error_handler=errors), errors
+
+
+def feed(decoder, data):
+    for position in range(0, len(data), CHUNK_SIZE):
+        decoder.feed(data[position:position + CHUNK_SIZE])
+
+
+def decoder_ops():
+    values = metrics.snapshot()
+    return sum(values.get(k, 0) for k in ('decoder_text_runs', 'decoder_controls', 'decoder_sequence_bytes'))
+
+
+def measure(target, data, repeat=3):
+    """return a dict with the results for target and data"""
+    sink = None
+    if target == 'console':
+        sink = PtySink() if os.name == 'posix' else open(os.devnull, 'wb')
+    output = getattr(sink, 'output', sink)
+    try:
+        best = None
+        for _ in range(repeat):
+            decoder, errors = make_decoder(target, output)
+            ops = decoder_ops()
+            t_start = time.perf_counter()
+            feed(decoder, data)
+            duration = time.perf_counter() - t_start
+            ops = decoder_ops() - ops
+            if best is None or duration < best:
+                best = duration
+                best_ops = ops
+                best_errors = errors.count
+        # allocations are measured separately, tracemalloc slows down
+        decoder, errors = make_decoder(target, output)
+        tracemalloc.start()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        feed(decoder, data)
+        peak = tracemalloc.get_traced_memory()[1] - start_memory
+        tracemalloc.stop()
+    finally:
+        if sink is not None:
+            sink.close()
+    return {
+        'bytes': len(data),
+        'seconds': best,
+        'mb_per_s': len(data) / best / 1e6,
+        'ops_per_s': best_ops / best,
+        'alloc_peak_per_byte': peak / len(data),
+        'errors': best_errors,
+    }
+
+
+def measure_printable(data, repeat=3):
+    text = data.decode('latin1')
+    result = bench_printable.measure(text, repeat=repeat)
+    return {
+        'bytes': len(data),
+        'seconds': result['table'],
+        'mb_per_s': len(text) / result['table'] / 1e6,
+        'ops_per_s': None,
+        'alloc_peak_per_byte': None,
+        'errors': 0,
+    }
+
+
+def git_version():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=str(pathlib.Path(__file__).parent), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_results):
+    """print the change of MB/s relative to an earlier run"""
+    old = {(r['stream'], r['target']): r for r in old_results['results']}
+    sys.stdout.write('\ncompared to {}:\n'.format(old_results.get('version')))
+    for result in results:
+        previous = old.get((result['stream'], result['target']))
+        if previous:
+            sys.stdout.write('{:14} {:10} {:+7.1f}%\n'.format(
+                result['stream'], result['target'],
+                (result['mb_per_s'] / previous['mb_per_s'] - 1) * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the receive path with synthetic data.')
+    parser.add_argument('--size', type=int, default=256, help='kB per stream, default: %(default)s')
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs, default: %(default)s')
+    parser.add_argument('--streams', nargs='+', choices=sorted(streams.STREAMS), default=sorted(streams.STREAMS))
+    parser.add_argument('--targets', nargs='+', choices=['decoder', 'terminal', 'console', 'printable'],
+                        default=['decoder', 'terminal', 'console', 'printable'])
+    parser.add_argument('--output', metavar='FILE', help='save results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='show the change relative to saved results')
+    args = parser.parse_args()
+
+    results = []
+    sys.stdout.write('{:14} {:10} {:>9} {:>12} {:>11} {:>7}\n'.format(
+        'stream', 'target', 'MB/s', 'ops/s', 'alloc/byte', 'errors'))
+    for stream in args.streams:
+        data = streams.STREAMS[stream](args.size * 1024)
+        for target in args.targets:
+            if target == 'printable':
+                result = measure_printable(data, args.repeat)
+            else:
+                result = measure(target, data, args.repeat)
+            result.update(stream=stream, target=target)
+            results.append(result)
+            sys.stdout.write('{:14} {:10} {:9.2f} {:>12} {:>11} {:7}\n'.format(
+                stream, target, result['mb_per_s'],
+                '-' if result['ops_per_s'] is None else '{:.0f}'.format(result['ops_per_s']),
+                '-' if result['alloc_peak_per_byte'] is None else '{:.2f}'.format(result['alloc_peak_per_byte']),
+                result['errors']))
+
+    document = {
+        'version': git_version(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'size': args.size * 1024,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Compare the table based Printable filter with the former per character loop.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import os
+import pathlib
+import random
+import sys
+import timeit
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.__main__ import Printable  # noqa: E402
+
+
+def printable_loop(text):
+    """the previous implementation, used as reference"""
+    r = []
+    for c in text:
+        if ' ' <= c < '\x7f' or c in '\r\n\b\t':
+            r.append(c)
+        elif c < ' ':
+            r.append(chr(0x2400 + ord(c)))
+        else:
+            r.extend(chr(0x2080 + ord(d) - 48) for d in '{:d}'.format(ord(c)))
+            r.append(' ')
+    return ''.join(r)
+
+
+def mixed_text():
+    """text lines with binary data in between, as latin1 decodes it"""
+    random.seed(0)
+    chunks = []
+    for n in range(200):
+        chunks.append('line {} of some log output\r\n'.format(n))
+        chunks.append(os.urandom(random.randint(0, 64)).decode('latin1'))
+    chunks.append('unicode: é€中\U0001f600\r\n')
+    return ''.join(chunks)
+
+
+def measure(text, repeat=50, reference=False):
+    """return the time per call in seconds, {'table': t, 'loop': t}"""
+    printable = Printable()
+    result = {'table': min(timeit.repeat(lambda: printable.rx(text), number=repeat, repeat=3)) / repeat}
+    if reference:
+        if printable.rx(text) != printable_loop(text):
+            raise AssertionError('outputs differ')
+        result['loop'] = min(timeit.repeat(lambda: printable_loop(text), number=repeat, repeat=3)) / repeat
+    return result
+
+
+def main():
+    text = mixed_text()
+    result = measure(text, reference=True)
+    t_loop = result['loop']
+    t_table = result['table']
+    sys.stdout.write('{} characters\n'.format(len(text)))
+    sys.stdout.write('loop:  {:8.3f} ms  {:6.2f} MB/s\n'.format(t_loop * 1e3, len(text) / t_loop / 1e6))
+    sys.stdout.write('table: {:8.3f} ms  {:6.2f} MB/s\n'.format(t_table * 1e3, len(text) / t_table / 1e6))
+    sys.stdout.write('speedup: {:.1f}x\n'.format(t_loop / t_table))
+
+
+if __name__ == '__main__':
+    main()
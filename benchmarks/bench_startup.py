@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Start up time: import times and time until the first output.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Usage: python benchmarks/bench_startup.py [--runs N] [--target MS] [--output results.json]
+
+- import: cumulative import time of serial_terminal.__main__ as reported by
+  "python -X importtime", with the slowest imports
+- first byte: time from starting "python -m serial_terminal PORT" in a pty
+  until it writes its first output (posix only). PORT is a second pty, as
+  a stand-in for a device (loop:// would add the URL handler imports of
+  pySerial). The time of "python -c print()" is shown as baseline.
+
+Exits with status 1 if the median time to first byte is above --target.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import select
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+def import_times():
+    """return {module: (self_us, cumulative_us)} of one interpreter run"""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import serial_terminal.__main__'],
+        cwd=str(ROOT), stderr=subprocess.PIPE, check=True).stderr.decode()
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def time_to_first_byte(command, timeout=10):
+    """run command in a pty, return the seconds until it writes something"""
+    import pty
+    master, slave = pty.openpty()
+    t_start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=str(ROOT), stdin=slave, stdout=slave, stderr=slave)
+    try:
+        ready, _, _ = select.select([master], [], [], timeout)
+        t_first = time.perf_counter() if ready else None
+        if ready:
+            os.read(master, 1024)
+        os.write(master, b'\x1d')     # exit key
+        process.wait(timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        os.close(master)
+        os.close(slave)
+    return None if t_first is None else t_first - t_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the start up time.')
+    parser.add_argument('--runs', type=int, default=10, help='number of runs, default: %(default)s')
+    parser.add_argument('--target', type=float, default=50.0, help='ms to first byte, default: %(default)s')
+    parser.add_argument('--output', metavar='FILE', help='save results as JSON')
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    total = statistics.median(r['serial_terminal.__main__'][1] for r in runs) / 1e3
+    sys.stdout.write('import serial_terminal.__main__: {:.1f} ms (median of {})\n'.format(total, args.runs))
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:10]
+    for name, (self_us, cumulative_us) in slowest:
+        sys.stdout.write('    {:40} {:6.1f} ms self {:6.1f} ms cumulative\n'.format(
+            name, self_us / 1e3, cumulative_us / 1e3))
+    result = {'import_ms': total, 'slowest_imports': {name: t[0] / 1e3 for name, t in slowest}}
+
+    if os.name == 'posix':
+        baseline = statistics.median(
+            time_to_first_byte([sys.executable, '-c', 'print()']) for _ in range(args.runs)) * 1e3
+        import pty
+        device, port = pty.openpty()
+        first_bytes = [time_to_first_byte([sys.executable, '-m', 'serial_terminal', os.ttyname(port)])
+                       for _ in range(args.runs)]
+        os.close(device)
+        os.close(port)
+        if None in first_bytes:
+            sys.stdout.write('no output from the terminal\n')
+            sys.exit(1)
+        first_byte = statistics.median(first_bytes) * 1e3
+        sys.stdout.write('first byte: {:.1f} ms (interpreter alone: {:.1f} ms), target {:.0f} ms: {}\n'.format(
+            first_byte, baseline, args.target, 'ok' if first_byte <= args.target else 'too slow'))
+        result.update(first_byte_ms=first_byte, baseline_ms=baseline, target_ms=args.target)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if result.get('first_byte_ms', 0) > args.target:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
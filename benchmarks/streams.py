@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Synthetic receive streams for the benchmarks.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Each generator returns `size` bytes (approximately, cut at the end) of
+reproducible data, resembling what devices send.
+"""
+
+import random
+
+WORDS = ('boot', 'init', 'sensor', 'ok', 'value', 'timeout', 'retry', 'link', 'up', 'down',
+         'temperature', 'voltage', 'irq', 'dma', 'buffer', 'flash', 'erase', 'write', 'done')
+
+
+def _fill(size, make_chunk, seed):
+    rng = random.Random(seed)
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = make_chunk(rng)
+        chunks.append(chunk)
+        length += len(chunk)
+    return b''.join(chunks)[:size]
+
+
+def plain_log(size, seed=0):
+    """text lines as from a boot log"""
+    def line(rng):
+        return '[{:10.6f}] {}\r\n'.format(
+            rng.random() * 1000, ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))).encode('ascii')
+    return _fill(size, line, seed)
+
+
+def sgr_heavy(size, seed=0):
+    """colored log output, color changes every few words"""
+    def line(rng):
+        words = []
+        for _ in range(rng.randint(3, 12)):
+            words.append('\x1b[{};{}m{}\x1b[0m'.format(rng.choice((0, 1)), rng.randint(30, 37), rng.choice(WORDS)))
+        return (' '.join(words) + '\r\n').encode('ascii')
+    return _fill(size, line, seed)
+
+
+def curses_redraw(size, seed=0, width=80, height=24):
+    """full screen updates: clear, cursor positioning, attributes, erase in line"""
+    def screen(rng):
+        parts = ['\x1b[H\x1b[2J']
+        for row in range(1, height + 1):
+            parts.append('\x1b[{};1H\x1b[{}m'.format(row, rng.choice((0, 7, 32, 44))))
+            parts.append(''.join(rng.choice('abcdefghij |-+') for _ in range(rng.randint(0, width))))
+            parts.append('\x1b[K')
+        parts.append('\x1b[0m\x1b[{};{}H'.format(rng.randint(1, height), rng.randint(1, width)))
+        return ''.join(parts).encode('ascii')
+    return _fill(size, screen, seed)
+
+
+def binary_noise(size, seed=0):
+    """random bytes, e.g. a wrong baud rate or a binary protocol"""
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def utf8_text(size, seed=0):
+    """text with many multi byte characters"""
+    alphabet = 'aäöüé€中文字日本語한국어Ελληνικάрусский\U0001f600\U0001f680 '
+
+    def line(rng):
+        return (''.join(rng.choice(alphabet) for _ in range(rng.randint(10, 60))) + '\r\n').encode('utf-8')
+    data = _fill(size, line, seed)
+    # do not end in the middle of a character
+    return data.decode('utf-8', 'ignore').encode('utf-8')
+
+
+STREAMS = {
+    'plain_log': plain_log,
+    'sgr_heavy': sgr_heavy,
+    'curses_redraw': curses_redraw,
+    'binary_noise': binary_noise,
+    'utf8_text': utf8_text,
+}
@@ -8,24 +8,46 @@
 # SPDX-License-Identifier:    BSD-3-Clause
 
 import codecs
+import functools
 import os
+import re
 import sys
 import threading
-import traceback
+import time
 
 from .console import Console
 from .terminal.escape_decoder import EscapeDecoder
 from .terminal.escape_encoder import EscapeEncoder
+from .terminal.constants import Foreground
 from .emulation.simple import SimpleTerminal
-from .features import menu, ask_for_port, startup_message
+from .features import menu, startup_message
+from . import metrics
 
 import serial
-from serial.tools import hexlify_codec
 from . import __version__
 
 # pylint: disable=wrong-import-order,wrong-import-position
+# Modules that are only needed for some options (capture, framing, hexdump,
+# sessions, diagnostics, most features) are imported where they are used,
+# this keeps the start up time short.
+
+
+def hexlify_search(encoding):
+    """codec search function, imports the codec on first use"""
+    if encoding == 'hexlify':
+        from serial.tools import hexlify_codec
+        return hexlify_codec.getregentry()
+    return None
+
+
+codecs.register(hexlify_search)
+
+
+def frame_spec(spec):
+    """argparse type for --frame"""
+    from .terminal.framing import framer_for_spec
+    return framer_for_spec(spec)
 
-codecs.register(lambda c: hexlify_codec.getregentry() if c == 'hexlify' else None)
 
 try:
     unichr
@@ -37,6 +59,19 @@ except NameError:
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 class Transform(object):
     """do-nothing: forward all data unchanged"""
+
+    def table(self, direction):
+        """\
+        Return a str.translate() table that does the same as the method
+        `direction` ('rx', 'tx' or 'echo'), or None if there is no such table.
+        Consecutive transformations with tables are merged into one pass (see
+        compile_transformations). Subclasses overriding rx/tx/echo need to
+        override this too.
+        """
+        if getattr(type(self), direction) is getattr(Transform, direction):
+            return {}   # not overridden, do-nothing
+        return None
+
     def rx(self, text):
         """text received from serial port"""
         return text
@@ -53,6 +88,11 @@ class Transform(object):
 class CRLF(Transform):
     """ENTER sends CR+LF"""
 
+    def table(self, direction):
+        if direction == 'tx':
+            return {0x0A: '\r\n'}
+        return super(CRLF, self).table(direction)
+
     def tx(self, text):
         return text.replace('\n', '\r\n')
 
@@ -60,6 +100,13 @@ class CRLF(Transform):
 class CR(Transform):
     """ENTER sends CR"""
 
+    def table(self, direction):
+        if direction == 'rx':
+            return {0x0D: 0x0A}
+        elif direction == 'tx':
+            return {0x0A: 0x0D}
+        return super(CR, self).table(direction)
+
     def rx(self, text):
         return text.replace('\r', '\n')
 
@@ -81,6 +128,11 @@ class NoTerminal(Transform):
             0x9B: 0x2425,  # CSI
         })
 
+    def table(self, direction):
+        if direction in ('rx', 'echo'):
+            return self.REPLACEMENT_MAP
+        return super(NoTerminal, self).table(direction)
+
     def rx(self, text):
         return text.translate(self.REPLACEMENT_MAP)
 
@@ -99,42 +151,232 @@ class NoControls(NoTerminal):
         })
 
 
+class PrintableTable(dict):
+    """\
+    str.translate() table for Printable. Entries for ASCII are precomputed,
+    others are computed on first use and cached, up to `max_size` entries.
+    """
+
+    def __init__(self, max_size=4096):
+        super(PrintableTable, self).__init__()
+        self.max_size = max_size
+        for code in range(128):
+            self[code] = self.replacement(code)
+
+    @staticmethod
+    def replacement(code):
+        """return the replacement for one code point"""
+        c = unichr(code)
+        if ' ' <= c < '\x7f' or c in '\r\n\b\t':
+            return code
+        elif c < ' ':
+            return 0x2400 + code
+        else:
+            return ''.join(unichr(0x2080 + ord(d) - 48) for d in '{:d}'.format(code)) + ' '
+
+    def __missing__(self, code):
+        replacement = self.replacement(code)
+        if len(self) < self.max_size:
+            self[code] = replacement
+        return replacement
+
+
 class Printable(Transform):
     """Show decimal code for all non-ASCII characters and replace most control codes"""
 
+    TABLE = PrintableTable()
+
     def rx(self, text):
-        r = []
-        for c in text:
-            if ' ' <= c < '\x7f' or c in '\r\n\b\t':
-                r.append(c)
-            elif c < ' ':
-                r.append(unichr(0x2400 + ord(c)))
-            else:
-                r.extend(unichr(0x2080 + ord(d) - 48) for d in '{:d}'.format(ord(c)))
-                r.append(' ')
-        return ''.join(r)
+        return text.translate(self.TABLE)
 
     echo = rx
 
 
+def sgr_sequence(color):
+    """\
+    Return the escape sequence for a color name (e.g. 'red', 'lightblue') or
+    for SGR parameters given as numbers (e.g. '1;33').
+    """
+    if all(c in '0123456789;' for c in color):
+        return '\x1b[{}m'.format(color)
+    try:
+        return '\x1b[{}m'.format(getattr(Foreground, color.upper()))
+    except AttributeError:
+        raise ValueError('unknown color: {!r}'.format(color))
+
+
 class Colorize(Transform):
     """Apply different colors for received and echo"""
 
-    def __init__(self):
-        # XXX make it configurable, use colorama?
-        self.input_color = '\x1b[37m'
-        self.echo_color = '\x1b[31m'
+    SGR = re.compile('\x1b\\[([0-9;]*)m')
+    # the start of an SGR sequence at the end of a chunk, completed by the next one
+    PARTIAL_SGR = re.compile('\x1b(\\[[0-9;]*)?$')
+
+    def __init__(self, input_color='white', echo_color='red'):
+        self.input_color = sgr_sequence(input_color)
+        self.echo_color = sgr_sequence(echo_color)
+        self.current = None
+        # SGR parameters the device has set since its last reset, restored
+        # when switching back from echo
+        self.device_sgr = []
+        self._partial = ''
+        # rx and echo are called from the reader and the writer thread
+        self._lock = threading.Lock()
 
     def rx(self, text):
-        return self.input_color + text
+        if not text:
+            return text
+        with self._lock:
+            prefix = ''
+            if self.current != 'rx':
+                prefix = self.input_color
+                if self.current == 'echo':
+                    # undo the echo color and restore what the device had set
+                    prefix = '\x1b[0m' + self.input_color
+                    if self.device_sgr:
+                        prefix += '\x1b[{}m'.format(';'.join(self.device_sgr))
+                self.current = 'rx'
+            if '\x1b' in text or self._partial:
+                self.track_device_sgr(text)
+        return prefix + text
+
+    def track_device_sgr(self, text):
+        """remember SGR parameters, to be called with the lock held"""
+        text = self._partial + text
+        partial = self.PARTIAL_SGR.search(text, max(0, len(text) - 32))
+        if partial is not None:
+            self._partial = partial.group()
+            text = text[:partial.start()]
+        else:
+            self._partial = ''
+        for parameters in self.SGR.findall(text):
+            if parameters.split(';')[0] in ('', '0'):
+                del self.device_sgr[:]
+                parameters = parameters.partition(';')[2]
+            if parameters:
+                self.device_sgr.append(parameters)
+                del self.device_sgr[:-8]
 
     def echo(self, text):
-        return self.echo_color + text
+        if not text:
+            return text
+        with self._lock:
+            if self.current != 'echo':
+                self.current = 'echo'
+                # do not inherit bold, underline etc. from the device
+                text = '\x1b[0m' + self.echo_color + text
+        return text
+
+
+class Timestamp(Transform):
+    """Prefix each received line with the date and time"""
+
+    def __init__(self):
+        self.line_start = True
+        self.start_time = time.time()
+        self._second = None
+        self._second_text = None
+
+    def format_time(self, t):
+        """format time with us resolution, the whole seconds are cached"""
+        second = int(t)
+        if second != self._second:
+            self._second = second
+            self._second_text = self.format_second(second)
+        return '{}.{:06d} '.format(self._second_text, int((t - second) * 1e6))
+
+    def format_second(self, second):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+
+    def prefixes(self, now):
+        """return the prefix for the first and for the following lines in a chunk"""
+        prefix = self.format_time(now)
+        return prefix, prefix
+
+    def rx(self, text):
+        if not text or (not self.line_start and '\n' not in text):
+            return text
+        first, other = self.prefixes(time.time())
+        head = ''
+        if not self.line_start:
+            # the first line was started in a previous chunk
+            end = text.index('\n') + 1
+            head, text = text[:end], text[end:]
+            if not text:
+                self.line_start = True
+                return head
+        self.line_start = text.endswith('\n')
+        if self.line_start:
+            # the line after a trailing newline starts with the next chunk
+            return head + first + text[:-1].replace('\n', '\n' + other) + '\n'
+        return head + first + text.replace('\n', '\n' + other)
+
+
+class RelativeTimestamp(Timestamp):
+    """Prefix each received line with the time since start"""
+
+    def format_time(self, t):
+        return Timestamp.format_time(self, t - self.start_time)
+
+    def format_second(self, second):
+        return '{:8d}'.format(second)
+
+
+class DeltaTimestamp(RelativeTimestamp):
+    """Prefix each received line with the time since the previous line"""
+
+    def __init__(self):
+        super(DeltaTimestamp, self).__init__()
+        self.previous_time = self.start_time
+
+    def prefixes(self, now):
+        # all lines of one chunk arrived at the same time
+        first = Timestamp.format_time(self, now - self.previous_time)
+        self.previous_time = now
+        return first, Timestamp.format_time(self, 0.0)
+
+
+def merge_tables(first, second):
+    """return a str.translate() table that does the same as applying both tables"""
+    merged = {}
+    for code in set(first) | set(second):
+        result = unichr(code).translate(first).translate(second)
+        if result != unichr(code):
+            merged[code] = result
+    return merged
+
+
+def compile_transformations(transformations, direction, keep=()):
+    """\
+    Return a list of functions that apply the method `direction` of all
+    transformations. Runs of transformations that provide a translation table
+    are merged into a single str.translate() call, do-nothing steps are
+    dropped. The codes in `keep` are left out of the tables, so that they
+    pass unchanged (e.g. ESC for the terminal emulation).
+    """
+    steps = []
+    table = None
+    for transformation in transformations:
+        t_table = transformation.table(direction)
+        if t_table is not None and any(code in t_table for code in keep):
+            t_table = dict((code, value) for code, value in t_table.items() if code not in keep)
+        if t_table is None:
+            if table:
+                steps.append(functools.partial(unicode_translate, table=table))
+            table = None
+            steps.append(getattr(transformation, direction))
+        elif table is None:
+            table = t_table
+        else:
+            table = merge_tables(table, t_table)
+    if table:
+        steps.append(functools.partial(unicode_translate, table=table))
+    return steps
+
 
+def unicode_translate(text, table):
+    return text.translate(table)
 
-# other ideas:
-# - add date/time for each newline
-# - insert newline after: a) timeout b) packet end character
 
 EOL_TRANSFORMATIONS = {
     'crlf': CRLF,
@@ -148,6 +390,9 @@ TRANSFORMATIONS = {
     'nocontrol': NoControls,
     'printable': Printable,
     'colorize': Colorize,
+    'timestamp': Timestamp,
+    'reltime': RelativeTimestamp,
+    'deltatime': DeltaTimestamp,
 }
 
 
@@ -159,10 +404,15 @@ class Miniterm(object):
     Handle special keys from the console to show menu etc.
     """
 
-    def __init__(self, serial_instance, echo=False, eol='crlf', filters=(), features=(), exit_key='Ctrl+]'):
+    # codes that start escape sequences, the rx filter tables leave them to
+    # the terminal emulation so that colors and cursor movements still work
+    EMULATED_CODES = (0x1B, 0x9B)
+
+    def __init__(self, serial_instance, echo=False, eol='crlf', filters=(), features=(), exit_key='Ctrl+]',
+                 transformation_options=None):
         self.console = Console()
         self.terminal = SimpleTerminal(self.console)
-        self.escape_decoder = EscapeDecoder(self.terminal)
+        self.escape_decoder = EscapeDecoder(self.terminal, error_handler=self.handle_decoder_error)
         self.escape_encoder = EscapeEncoder()
         self.serial = serial_instance
         self.echo = echo
@@ -170,6 +420,8 @@ class Miniterm(object):
         self.output_encoding = 'UTF-8'
         self.eol = eol
         self.filters = filters
+        # keyword arguments for transformation classes, {class: {...}}
+        self.transformation_options = transformation_options or {}
         self.update_transformations()
         self.exit_key = exit_key
         self.alive = None
@@ -177,6 +429,30 @@ class Miniterm(object):
         self.receiver_thread = None
         self.rx_decoder = None
         self.tx_decoder = None
+        self.capture = None
+        self.framer = None
+        self.hexdump = None
+        # callbacks of features (see Feature.subscribe): chunks of received
+        # and transmitted bytes, typed keys, received lines and frames. lines
+        # are only split if someone subscribed
+        self.hooks = {'rx': [], 'tx': [], 'key': [], 'line': [], 'frame': []}
+        # time.time() right after the read of the chunk that is processed,
+        # the arrival time for the rx, line and frame hooks
+        self.rx_time = None
+        self._line_buffer = bytearray()
+        # tap.Tap instances among the callbacks, their threads end on close
+        self.taps = []
+        self._plugins = None
+        self.port_watcher = None    # see features.port_watcher
+        self.reconnect = None       # see features.reconnect
+        self.connected = True
+        self._expect_buffer = None
+        # if set, received data is passed to it instead of being processed,
+        # it returns the part of the data that should be processed normally
+        self.rx_sink = None
+        # diagnostics, see profiling.Profiler
+        self.profiler = None
+        self.stage_timers = None
         self.hotkeys = {}
         self.hotkeys[self.exit_key] = self.handle_exit_key
         self._features = [f(self, **kwargs) for f, kwargs in features]
@@ -185,7 +461,8 @@ class Miniterm(object):
         """Start reader thread"""
         self._reader_alive = True
         # start serial->console thread
-        self.receiver_thread = threading.Thread(target=self.reader, name='rx')
+        target = self.reader if self.profiler is None else self.profiler.wrap(self.reader, 'rx')
+        self.receiver_thread = threading.Thread(target=target, name='rx')
         self.receiver_thread.daemon = True
         self.receiver_thread.start()
 
@@ -201,7 +478,8 @@ class Miniterm(object):
         self.alive = True
         self._start_reader()
         # enter console->serial loop
-        self.transmitter_thread = threading.Thread(target=self.writer, name='tx')
+        target = self.writer if self.profiler is None else self.profiler.wrap(self.writer, 'tx')
+        self.transmitter_thread = threading.Thread(target=target, name='tx')
         self.transmitter_thread.daemon = True
         self.transmitter_thread.start()
         self.console.setup()
@@ -221,14 +499,24 @@ class Miniterm(object):
             self.receiver_thread.join()
 
     def close(self):
+        for f in self._features:
+            f.stop()
+        for tap in self.taps:
+            tap.close(timeout=1)
         self.serial.close()
+        if self.capture is not None:
+            self.capture.close()
 
     def update_transformations(self):
         """take list of transformation classes and instantiate them for rx and tx"""
         transformations = [EOL_TRANSFORMATIONS[self.eol]] + [TRANSFORMATIONS[f]
                                                              for f in self.filters]
-        self.tx_transformations = [t() for t in transformations]
+        self.tx_transformations = [t(**self.transformation_options.get(t, {})) for t in transformations]
         self.rx_transformations = list(reversed(self.tx_transformations))
+        # compiled versions, used for the actual data
+        self._tx_steps = compile_transformations(self.tx_transformations, 'tx')
+        self._echo_steps = compile_transformations(self.tx_transformations, 'echo')
+        self._rx_steps = compile_transformations(self.rx_transformations, 'rx', keep=self.EMULATED_CODES)
 
     def set_rx_encoding(self, encoding, errors='replace'):
         """set encoding for received data"""
@@ -241,36 +529,192 @@ class Miniterm(object):
         self.tx_encoder = codecs.getincrementalencoder(encoding)(errors)
 
     def reader(self):
-        """loop and copy serial->console"""
-        try:
-            while self.alive and self._reader_alive:
-                # read all that is there or wait for one byte
+        """loop and copy serial->console, reconnect on errors if enabled"""
+        while True:
+            try:
+                self.copy_received()
+            except serial.SerialException as e:
+                if self.reconnect is None:
+                    self.alive = False
+                    self.console.cancel()
+                    raise       # XXX handle instead of re-raise?
+                if self.reconnect.handle_disconnect(e):
+                    continue
+                if self.alive and self._reader_alive:
+                    # the port can not be reopened
+                    self.alive = False
+                    self.console.cancel()
+            return
+
+    def copy_received(self):
+        """read and process data until stopped"""
+        counters = metrics.thread_counters()
+        timers = self.stage_timers
+        while self.alive and self._reader_alive:
+            # read all that is there or wait for one byte
+            if timers is None:
                 data = self.serial.read(self.serial.in_waiting or 1)
-                for byte in serial.iterbytes(data):
-                    try:
-                        self.escape_decoder.handle(byte)
-                    except Exception as e:
-                        traceback.print_exc()
-                    #     text = self.rx_decoder.decode(data)
-                    #     for transformation in self.rx_transformations:
-                    #         text = transformation.rx(text)
-                    #     self.console.write(text)
+            else:
+                start = time.perf_counter()
+                data = self.serial.read(self.serial.in_waiting or 1)
+                timers.add('read', time.perf_counter() - start)
+            self.rx_time = time.time()
+            counters['reader_wakeups'] += 1
+            if data:
+                counters['rx_bytes'] += len(data)
+                counters['rx_chunks'] += 1
+            if self.capture is not None and data:
+                self.capture.write(data, self.rx_time)
+            if self.rx_sink is not None and data:
+                data = self.rx_sink(data)
+                if not data:
+                    continue
+            if self.framer is not None:
+                # also fed on timeouts, so that gaps end frames
+                for frame in self.framer.feed(data, time.perf_counter()):
+                    for handler in self.hooks['frame']:
+                        handler(frame)
+                    self.display(frame, end_of_frame=True)
+            elif data:
+                self.display(data)
+            if data:
+                for handler in self.hooks['rx']:
+                    handler(data)
+                if self.hooks['line']:
+                    self.split_lines(data)
+
+    def display(self, data, end_of_frame=False):
+        """decode, filter and show received data"""
+        if self.hexdump is not None:
+            self.hexdump.write(data, timestamp=self.rx_time)
+            if end_of_frame:
+                self.hexdump.end_frame()
+            return
+        timers = self.stage_timers
+        if timers is not None:
+            start = time.perf_counter()
+        text = self.rx_decoder.decode(data)
+        if end_of_frame:
+            text += '\n'
+        for step in self._rx_steps:
+            text = step(text)
+        if timers is not None:
+            decoded = time.perf_counter()
+            timers.add('decode', decoded - start)
+        self.escape_decoder.feed(text.encode('UTF-8'))
+        if timers is not None:
+            # includes the time spent in console writes (the "render" stage)
+            timers.add('emulate', time.perf_counter() - decoded)
+        metrics.thread_counters()['render_flushes'] += 1
+
+    MAX_LINE = 65536
+
+    def split_lines(self, data):
+        """call the line handlers with each complete line (bytes, without EOL)"""
+        buffer = self._line_buffer
+        handlers = self.hooks['line']
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end - 1 if end > start and buffer[end - 1] == 0x0d else end])
+            start = end + 1
+            for handler in handlers:
+                handler(line)
+        del buffer[:start]
+        if len(buffer) > self.MAX_LINE:
+            # no end of line in sight, pass it on anyway
+            line = bytes(buffer)
+            buffer.clear()
+            for handler in handlers:
+                handler(line)
+
+    def add_feature(self, feature):
+        """\
+        Use a feature that is created after start up (e.g. a plug-in), it is
+        started now and stopped on close like the others.
+        """
+        feature.start()
+        self._features.append(feature)
+
+    @property
+    def plugins(self):
+        """registry of the installed plug-ins, discovered on first use"""
+        if self._plugins is None:
+            from .features.registry import FeatureRegistry
+            self._plugins = FeatureRegistry().discover()
+        return self._plugins
+
+    def get_expect_buffer(self):
+        """\
+        Return the buffer for expect(). It is created on the first call and
+        collects received data from then on.
+        """
+        if self._expect_buffer is None:
+            from .terminal.expect import ExpectBuffer
+            self._expect_buffer = ExpectBuffer()
+            self.hooks['rx'].append(self._expect_buffer.feed)
+        return self._expect_buffer
+
+    def send(self, text):
+        """send text to the serial port, transformations (e.g. EOL) are applied"""
+        for step in self._tx_steps:
+            text = step(text)
+        self.transmit(text.encode(self.output_encoding, 'replace'))
+
+    def transmit(self, data):
+        """write bytes to the serial port, as they are"""
+        counters = metrics.thread_counters()
+        counters['tx_bytes'] += len(data)
+        counters['tx_chunks'] += 1
+        for handler in self.hooks['tx']:
+            handler(data)
+        if not self.connected:
+            self.reconnect.hold(data)
+            return
+        try:
+            if self.stage_timers is None:
+                self.serial.write(data)
+            else:
+                start = time.perf_counter()
+                self.serial.write(data)
+                self.stage_timers.add('write', time.perf_counter() - start)
         except serial.SerialException:
-            self.alive = False
-            self.console.cancel()
-            raise       # XXX handle instead of re-raise?
+            if self.reconnect is None:
+                raise
+            # the reader notices it too and reconnects
+            self.reconnect.hold(data)
+
+    def enable_profiling(self, profiler):
+        """collect timings and profiles, call before start()"""
+        self.profiler = profiler
+        self.stage_timers = profiler.timers
+        self.console.write = profiler.timers.timed('render', self.console.write)
+        self.console.write_bytes = profiler.timers.timed('render', self.console.write_bytes)
+
+    def handle_decoder_error(self, exception):
+        """report errors in the terminal emulation, but keep going"""
+        import traceback
+        traceback.print_exc()
 
     def send_key(self, key_name):
         if len(key_name) > 1:
             key_name = self.escape_encoder.translate_named_key(key_name)
         text = key_name
-        for transformation in self.tx_transformations:
-            text = transformation.tx(text)
-        self.serial.write(self.tx_encoder.encode(text))
-        if self.echo:
+        for step in self._tx_steps:
+            text = step(text)
+        data = self.tx_encoder.encode(text)
+        for handler in self.hooks['key']:
+            handler(data)
+        self.transmit(data)
+        if self.echo and self.hexdump is not None:
+            self.hexdump.write(data, 'TX')
+        elif self.echo:
             echo_text = key_name
-            for transformation in self.tx_transformations:
-                echo_text = transformation.echo(echo_text)
+            for step in self._echo_steps:
+                echo_text = step(echo_text)
             self.console.write(echo_text)
 
     def handle_exit_key(self, key_name):
@@ -318,6 +762,10 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
                 raise ValueError('{!r} is not a valid modifier ({})'.format(part, MODIFIERS))
         return key_name
 
+    def check_color(color):
+        sgr_sequence(color)
+        return color
+
     parser = argparse.ArgumentParser(description="pySerial-terminal")
 
     parser.add_argument(
@@ -366,6 +814,53 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
         help="set initial DTR line state (possible values: 0, 1)",
         default=default_dtr)
 
+    group.add_argument(
+        "--no-port-watch",
+        action="store_true",
+        help="do not watch the list of ports in the background (used for the port menu and to "
+             "report when the device comes back)",
+        default=False)
+
+    group.add_argument(
+        "--auto-baud",
+        action="store_true",
+        help="detect the baud rate from the received data at start",
+        default=False)
+
+    group.add_argument(
+        "--auto-baud-budget",
+        type=float,
+        metavar="SECONDS",
+        help="time to try the rates with --auto-baud, default: %(default)s",
+        default=5.0)
+
+    group.add_argument(
+        "--auto-baud-cr",
+        action="store_true",
+        help="send a CR at each rate to get a prompt from the device",
+        default=False)
+
+    group.add_argument(
+        "--reconnect",
+        action="store_true",
+        help="reopen the port when it fails (e.g. USB adapter reset), found by name or USB serial number",
+        default=False)
+
+    group.add_argument(
+        "--reconnect-buffer",
+        type=int,
+        metavar="BYTES",
+        help="with --reconnect, keep up to BYTES of input typed while disconnected and send it afterwards, "
+             "default: %(default)s",
+        default=0)
+
+    group.add_argument(
+        "--reconnect-max-delay",
+        type=float,
+        metavar="SECONDS",
+        help="with --reconnect, longest pause between attempts, default: %(default)s",
+        default=5.0)
+
     group.add_argument(
         "--ask",
         action="store_true",
@@ -400,6 +895,166 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
         help="end of line mode",
         default='CRLF')
 
+    group.add_argument(
+        "--log",
+        metavar="FILE",
+        help="write received data to a capture file, with a seekable index in FILE.idx")
+
+    group.add_argument(
+        "--log-index-interval",
+        type=int,
+        metavar="KB",
+        help="distance between index entries of the capture file, default: %(default)s",
+        default=64)
+
+    group.add_argument(
+        "--log-compress",
+        choices=['gzip', 'lzma'],
+        help="compress the capture file in independent blocks (with a block directory in FILE.blk)")
+
+    group.add_argument(
+        "--log-block-size",
+        type=int,
+        metavar="KB",
+        help="size of compressed capture blocks, default: %(default)s",
+        default=256)
+
+    group.add_argument(
+        "--frame",
+        type=frame_spec,
+        metavar="MODE",
+        help="split received data into frames, shown one per line: gap:SECONDS, delimiter:BYTE, "
+             "length:BYTES, slip or cobs")
+
+    group.add_argument(
+        "--hexdump",
+        action="store_true",
+        help="show data as hex dump with offset, hex and ASCII columns",
+        default=False)
+
+    group.add_argument(
+        "--hexdump-width",
+        type=int,
+        metavar="N",
+        help="bytes per hex dump row, default: %(default)s",
+        default=16)
+
+    group.add_argument(
+        "--hexdump-group",
+        type=int,
+        metavar="N",
+        help="bytes per group in the hex column, default: %(default)s",
+        default=1)
+
+    group.add_argument(
+        "--hexdump-time",
+        action="store_true",
+        help="show the time of arrival for each hex dump row",
+        default=False)
+
+    group.add_argument(
+        "--rx-color",
+        type=check_color,
+        metavar="COLOR",
+        help="color for received text with the colorize filter (name or SGR numbers), default: %(default)s",
+        default='white')
+
+    group.add_argument(
+        "--echo-color",
+        type=check_color,
+        metavar="COLOR",
+        help="color for local echo with the colorize filter, default: %(default)s",
+        default='red')
+
+    group.add_argument(
+        "--triggers",
+        metavar="FILE",
+        help="file with patterns to watch for in received data and actions to run")
+
+    group.add_argument(
+        "--script",
+        metavar="FILE",
+        help="run a Python script that can use expect() and send(), next to the interactive terminal")
+
+    group.add_argument(
+        "--upload-pacing",
+        action="store_true",
+        help="limit file uploads to the rate the port settings allow (for devices without flow control)",
+        default=False)
+
+    group = parser.add_argument_group("network")
+
+    group.add_argument(
+        "--bridge",
+        metavar="ADDRESS",
+        help="share the session with network clients on HOST:PORT, :PORT or unix:PATH")
+
+    group.add_argument(
+        "--bridge-rw",
+        action="store_true",
+        help="accept data from bridge clients (default: read-only)",
+        default=False)
+
+    group.add_argument(
+        "--bridge-queue",
+        type=int,
+        metavar="KB",
+        help="per client queue size, older data is dropped for slower clients, default: %(default)s",
+        default=1024)
+
+    group.add_argument(
+        "--bridge-disconnect-slow",
+        action="store_true",
+        help="disconnect clients that can not keep up instead of dropping data",
+        default=False)
+
+    group = parser.add_argument_group("sessions")
+
+    group.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep the port open in the background and let terminals attach to it (see --attach)",
+        default=False)
+
+    group.add_argument(
+        "--attach",
+        metavar="NAME",
+        help="attach to a session started with --daemon (the port name, e.g. ttyUSB0, or a socket path)")
+
+    group.add_argument(
+        "--session-name",
+        metavar="NAME",
+        help="name of the session started with --daemon, default: port name")
+
+    group.add_argument(
+        "--scrollback",
+        type=int,
+        metavar="KB",
+        help="received data kept by --daemon, default: %(default)s",
+        default=256)
+
+    group = parser.add_argument_group("plug-ins")
+
+    group.add_argument(
+        "--plugin",
+        action="append",
+        metavar="NAME",
+        help="load an installed plug-in at start (otherwise it is loaded on first use), can be given multiple times",
+        default=[])
+
+    group.add_argument(
+        "--plugin-key",
+        action="append",
+        metavar="NAME=KEY",
+        help="use a plug-in with a hot key, e.g. logger=F5, can be given multiple times",
+        default=[])
+
+    group.add_argument(
+        "--list-plugins",
+        action="store_true",
+        help="show the installed plug-ins and exit",
+        default=False)
+
     group = parser.add_argument_group("hotkeys")
 
     group.add_argument(
@@ -424,11 +1079,113 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
         help="show Python traceback on error",
         default=False)
 
+    group.add_argument(
+        "--profile",
+        choices=['cprofile', 'sample', 'timers'],
+        help="profile rx/tx threads with cProfile, with a sampling profiler or only time the stages "
+             "read, decode, emulate, render and write; written on exit or with the menu key")
+
+    group.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="trace memory allocations, a tracemalloc snapshot is saved with each profile",
+        default=False)
+
+    group.add_argument(
+        "--profile-output",
+        metavar="PREFIX",
+        help="file name prefix for profiling results, default: %(default)s",
+        default="serial_terminal-profile")
+
+    group.add_argument(
+        "--echo-latency",
+        action="store_true",
+        help="measure the time from a key press until its echo is shown, reported on exit and as metrics",
+        default=False)
+
+    group.add_argument(
+        "--echo-latency-probe",
+        type=int,
+        metavar="N",
+        help="send N keys automatically to measure the echo latency (e.g. with loop://)",
+        default=0)
+
+    group.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="periodically write counters (bytes, chunks, decoder and console operations, queues) to FILE")
+
+    group.add_argument(
+        "--metrics-format",
+        choices=['json', 'prometheus'],
+        help="format of --metrics-file, default: %(default)s",
+        default='json')
+
+    group.add_argument(
+        "--metrics-interval",
+        type=float,
+        metavar="SECONDS",
+        help="update interval of --metrics-file, default: %(default)s",
+        default=10.0)
+
     args = parser.parse_args()
 
     if args.menu_key == args.exit_key:
         parser.error('--exit-key can not be the same as --menu-key')
 
+    if args.list_plugins:
+        from .features.registry import FeatureRegistry
+        registry = FeatureRegistry().discover()
+        for plugin in registry:
+            sys.stdout.write('{}\n'.format(plugin))
+        if not len(registry):
+            sys.stdout.write('no plug-ins installed\n')
+        sys.exit(0)
+
+    plugin_keys = []
+    for binding in args.plugin_key:
+        name, _, key_name = binding.partition('=')
+        if not key_name:
+            parser.error('--plugin-key expects NAME=KEY, not {!r}'.format(binding))
+        try:
+            plugin_keys.append((name, check_key_name(key_name)))
+        except ValueError as e:
+            parser.error('--plugin-key {}: {}'.format(binding, e))
+
+    if args.daemon and args.attach:
+        parser.error('--daemon and --attach can not be used together')
+
+    if args.daemon:
+        # the session server has no console, terminal or features
+        from . import session
+        if serial_instance is None:
+            if args.port is None or args.port == '-':
+                parser.error('--daemon needs a port')
+            try:
+                serial_instance = serial.serial_for_url(
+                    args.port,
+                    args.baudrate,
+                    parity=args.parity,
+                    rtscts=args.rtscts,
+                    xonxoff=args.xonxoff,
+                    do_not_open=True)
+                if args.dtr is not None:
+                    serial_instance.dtr = args.dtr
+                if args.rts is not None:
+                    serial_instance.rts = args.rts
+                serial_instance.open()
+            except serial.SerialException as e:
+                if args.develop:
+                    raise
+                sys.stderr.write('could not open port {}: {}\n'.format(repr(args.port), e))
+                sys.exit(1)
+        session.serve(
+            serial_instance,
+            args.session_name or session.session_name(serial_instance.port),
+            scrollback_size=args.scrollback * 1024)
+        serial_instance.close()
+        return
+
     if args.filter:
         if 'help' in args.filter:
             sys.stderr.write('Available filters:\n')
@@ -441,20 +1198,85 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
     else:
         filters = ['default']
 
-    miniterm = Miniterm(
-        None,
-        echo=args.echo,
-        eol=args.eol.lower(),
-        filters=filters,
-        features=[
-            (startup_message.StartupMessage, {}),
-            (menu.Menu, {'hot_key': args.menu_key}),
-        ],
-        exit_key=args.exit_key)
+    features = [
+        (menu.Menu, {'hot_key': args.menu_key, 'upload_pacing': args.upload_pacing}),
+    ]
+    if not args.attach:
+        # the port settings are only known to the session server
+        features.insert(0, (startup_message.StartupMessage, {}))
+    if not (args.no_port_watch or args.attach):
+        from .features import port_watcher
+        features.append((port_watcher.PortWatcher, {}))
+    if args.auto_baud:
+        from .features import auto_baud
+        features.append((auto_baud.AutoBaud, {'budget': args.auto_baud_budget, 'send_cr': args.auto_baud_cr}))
+    if args.reconnect:
+        from .features import reconnect
+        features.append((reconnect.Reconnect, {
+            'max_delay': args.reconnect_max_delay,
+            'buffer_size': args.reconnect_buffer,
+        }))
+    if args.triggers:
+        from .features import triggers
+        features.append((triggers.Triggers, {'filename': args.triggers, 'encoding': args.encoding}))
+    if args.script:
+        from .features import script
+        features.append((script.Script, {'filename': args.script}))
+    if args.echo_latency or args.echo_latency_probe:
+        from .features import latency
+        features.append((latency.EchoLatency, {'probes': args.echo_latency_probe}))
+    if args.metrics_file:
+        from .features import live_metrics
+        features.append((live_metrics.MetricsExport, {
+            'filename': args.metrics_file,
+            'format': args.metrics_format,
+            'interval': args.metrics_interval,
+        }))
+    if args.bridge:
+        from .features import network_bridge
+        features.append((network_bridge.NetworkBridge, {
+            'address': args.bridge,
+            'read_write': args.bridge_rw,
+            'max_queue': args.bridge_queue * 1024,
+            'drop_policy': 'disconnect' if args.bridge_disconnect_slow else 'drop',
+        }))
+
+    try:
+        miniterm = Miniterm(
+            None,
+            echo=args.echo,
+            eol=args.eol.lower(),
+            filters=filters,
+            features=features,
+            exit_key=args.exit_key,
+            transformation_options={
+                Colorize: {'input_color': args.rx_color, 'echo_color': args.echo_color},
+            })
+    except (IOError, ValueError, SyntaxError, re.error) as e:
+        parser.error('could not start features: {}'.format(e))
+
+    startup_plugins = []
+    if plugin_keys or args.plugin:
+        from .features.registry import run_plugin
+        try:
+            for name, key_name in plugin_keys:
+                miniterm.hotkeys[key_name] = functools.partial(run_plugin, miniterm.plugins[name], miniterm)
+            startup_plugins = [miniterm.plugins[name] for name in args.plugin]
+        except KeyError as e:
+            parser.error(e.args[0])
+
+    if args.attach:
+        from . import session
+        try:
+            serial_instance = session.SessionClient(args.attach)
+        except serial.SerialException as e:
+            parser.error(str(e))
+        miniterm.console.write('--- attached to session {} ---\n'.format(serial_instance.port))
 
     while serial_instance is None:
         # no port given on command line -> ask user now
         if args.port is None or args.port == '-':
+            from .features import ask_for_port
             try:
                 args.port = ask_for_port.AskForPort(miniterm).ask_for_port()
             except KeyboardInterrupt:
@@ -495,12 +1317,54 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
     if not hasattr(serial_instance, 'cancel_read'):
         # enable timeout for alive flag polling if cancel_read is not available
         serial_instance.timeout = 1
+    if args.frame is not None and args.frame.idle_timeout is not None:
+        # the framer needs to see idle periods to finish frames
+        serial_instance.timeout = min(serial_instance.timeout or args.frame.idle_timeout, args.frame.idle_timeout)
+    miniterm.framer = args.frame
+    if args.hexdump:
+        from .emulation.hexdump import HexDump
+        try:
+            miniterm.hexdump = HexDump(
+                miniterm.console,
+                width=args.hexdump_width,
+                group=args.hexdump_group,
+                timestamps=args.hexdump_time,
+                direction=args.echo)
+        except ValueError as e:
+            parser.error(str(e))
 
     miniterm.serial = serial_instance
+    if args.log and args.log_compress:
+        from .capture.compressed import CompressedCaptureWriter
+        miniterm.capture = CompressedCaptureWriter(
+            args.log,
+            method=args.log_compress,
+            block_size=args.log_block_size * 1024,
+            index_interval=args.log_index_interval * 1024,
+            message=lambda text: miniterm.console.write(text.replace('\n', '\r\n')))
+    elif args.log:
+        from .capture.writer import CaptureWriter
+        miniterm.capture = CaptureWriter(args.log, index_interval=args.log_index_interval * 1024)
     miniterm.set_rx_encoding(args.encoding)
     miniterm.set_tx_encoding(args.encoding)
 
+    if args.profile or args.profile_memory:
+        from . import profiling
+        try:
+            miniterm.enable_profiling(profiling.Profiler(
+                args.profile or 'timers',
+                prefix=args.profile_output,
+                memory=args.profile_memory))
+        except ValueError as e:
+            # e.g. an other profiler (or debugger) is active
+            parser.error('could not enable profiling: {}'.format(e))
+
     miniterm.start()
+    for plugin in startup_plugins:
+        try:
+            plugin.feature(miniterm)
+        except Exception as e:
+            miniterm.console.write('--- plug-in {} failed to load: {} ---\r\n'.format(plugin.name, e))
     try:
         miniterm.join(True)
     except KeyboardInterrupt:
@@ -508,6 +1372,12 @@ def main(default_port=None, default_baudrate=9600, default_rts=None, default_dtr
     miniterm.console.write("\r\n--- exit ---\r\n")
     miniterm.join()
     miniterm.close()
+    if miniterm.capture is not None:
+        miniterm.console.write('--- capture {}: {} ---\r\n'.format(args.log, miniterm.capture.summary()))
+    if miniterm.profiler is not None:
+        miniterm.profiler.stop()
+        for filename in miniterm.profiler.dump():
+            miniterm.console.write('--- profile written: {} ---\r\n'.format(filename))
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
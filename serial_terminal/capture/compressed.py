@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+#
+# Capture files compressed in independent blocks.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Received data is collected in blocks that are compressed independently on a
+thread pool (zlib and lzma release the GIL), so the reader thread only copies
+data into a buffer. Each block is a complete gzip member or xz stream, so the
+file as a whole can still be read with zcat/xzcat.
+
+A block directory (same name plus '.blk') lists the time range, raw and
+compressed position of each block, so a time range can be read by
+decompressing only the blocks that overlap it. The sparse index of the
+uncompressed data (see index.py) is kept as well, so the data read from the
+first and last block is trimmed to the index interval.
+"""
+
+import bisect
+import concurrent.futures
+import gzip
+import lzma
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+from .index import CaptureIndex, IndexWriter, _Column, index_filename, DEFAULT_INTERVAL
+
+MAGIC = b'STBLK\x00\x01\x00'
+HEADER = struct.Struct('<8s8s')          # magic, method
+# start time, end time, raw offset, raw size, compressed offset, compressed size, first line
+RECORD = struct.Struct('<ddQQQQQ')
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+METHODS = {
+    'gzip': (gzip.compress, gzip.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def directory_filename(filename):
+    """return the name of the block directory for a compressed capture file"""
+    return filename + '.blk'
+
+
+def _compress(method, data):
+    """runs in a worker thread, return compressed data and time spent"""
+    t_start = time.perf_counter()
+    compressed = METHODS[method][0](data)
+    return compressed, time.perf_counter() - t_start
+
+
+class CompressedCaptureWriter(object):
+    """\
+    Drop-in replacement for CaptureWriter that stores the data compressed.
+    A block is sealed when it is full or when its oldest data is older than
+    `max_age` seconds, so that a quiet port does not keep data in memory only
+    (the background thread checks that while no data arrives).
+
+    Errors of the background thread go to `message`: a block that can not be
+    compressed is lost, after a write error the capture is stopped and
+    further data is discarded.
+    """
+
+    def __init__(self, filename, method='gzip', block_size=DEFAULT_BLOCK_SIZE, max_age=10, workers=2,
+                 index_interval=DEFAULT_INTERVAL, message=None):
+        if method not in METHODS:
+            raise ValueError('unknown compression method: {!r}'.format(method))
+        self.filename = filename
+        self.method = method
+        self.block_size = block_size
+        self.max_age = max_age
+        self.message = message or (lambda text: None)
+        self.offset = 0
+        self.line = 0
+        self.compressed_size = 0
+        self.compress_time = 0.0
+        self.blocks = 0
+        self.lost_blocks = 0
+        self.error = None
+        self._file = open(filename, 'wb')
+        self._index = IndexWriter(index_filename(filename), index_interval)
+        self._directory = open(directory_filename(filename), 'wb')
+        self._directory.write(HEADER.pack(MAGIC, method.encode('ascii')))
+        self._buffer = bytearray()
+        self._block_start = None
+        self._block_end = None
+        self._block_line = 0
+        self._t_open = time.time()
+        # the block is sealed by write() or by the writer thread when it is too old
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        # futures are written in submission order by a separate thread
+        self._pending = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._write_blocks, name='capture')
+        self._writer_thread.daemon = True
+        self._writer_thread.start()
+
+    def write(self, data, timestamp=None):
+        """write a chunk of received bytes"""
+        if not data or self.error is not None:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._index.update(timestamp, self.offset, self.line)
+            if self._block_start is None:
+                self._block_start = timestamp
+                self._block_line = self.line
+            self._block_end = timestamp
+            self._buffer += data
+            self.offset += len(data)
+            self.line += data.count(b'\n')
+            if len(self._buffer) >= self.block_size or timestamp - self._block_start >= self.max_age:
+                self._seal()
+
+    def _seal(self):
+        """hand the current block over to the compression workers, to be called with the lock held"""
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        del self._buffer[:]
+        future = self._executor.submit(_compress, self.method, data)
+        self._pending.put((future, self._block_start, self._block_end,
+                           self.offset - len(data), len(data), self._block_line))
+        self._block_start = None
+
+    def _write_blocks(self):
+        """background thread: store compressed blocks in the order they were sealed"""
+        compressed_offset = 0
+        while True:
+            try:
+                item = self._pending.get(timeout=self.max_age / 2)
+            except queue.Empty:
+                # nothing received for a while, do not keep the open block in memory
+                with self._lock:
+                    if self._block_start is not None and time.time() - self._block_start >= self.max_age:
+                        self._seal()
+                continue
+            if item is None:
+                break
+            future, start, end, raw_offset, raw_size, line = item
+            if self.error is not None:
+                continue                # stopped, drop the remaining blocks
+            try:
+                compressed, duration = future.result()
+            except Exception as e:
+                self.lost_blocks += 1
+                self.message('--- capture: block at offset {} lost: {} ---\n'.format(raw_offset, e))
+                continue
+            try:
+                self._file.write(compressed)
+                self._directory.write(RECORD.pack(
+                    start, end, raw_offset, raw_size, compressed_offset, len(compressed), line))
+                self._file.flush()
+                self._directory.flush()
+            except OSError as e:
+                self.error = e
+                self.message('--- capture stopped: {} ---\n'.format(e))
+                continue
+            compressed_offset += len(compressed)
+            self.compressed_size = compressed_offset
+            self.compress_time += duration
+            self.blocks += 1
+
+    def flush(self):
+        with self._lock:
+            self._seal()
+
+    def close(self):
+        with self._lock:
+            self._seal()
+        self._pending.put(None)
+        self._writer_thread.join()
+        self._executor.shutdown()
+        self._file.close()
+        self._index.close()
+        self._directory.close()
+
+    def summary(self):
+        """return a one line description of the statistics"""
+        duration = max(time.time() - self._t_open, 1e-9)
+        summary = '{} bytes in {} {} blocks, ratio {:.1f}:1, {:.1f} kB/s received, {:.1f} MB/s compressed'.format(
+            self.offset,
+            self.blocks,
+            self.method,
+            self.offset / self.compressed_size if self.compressed_size else 0.0,
+            self.offset / duration / 1e3,
+            self.offset / self.compress_time / 1e6 if self.compress_time else 0.0)
+        if self.lost_blocks:
+            summary += ', {} blocks lost'.format(self.lost_blocks)
+        if self.error is not None:
+            summary += ', stopped: {}'.format(self.error)
+        return summary
+
+
+class CompressedCapture(object):
+    """\
+    Read access to a compressed capture file using its block directory and,
+    if present, its index.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._directory_file = open(directory_filename(filename), 'rb')
+        size = os.fstat(self._directory_file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError('block directory too short: {!r}'.format(directory_filename(filename)))
+        try:
+            self._data = mmap.mmap(self._directory_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._data = self._directory_file.read()
+        magic, method = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError('not a block directory: {!r}'.format(directory_filename(filename)))
+        self.method = method.rstrip(b'\0').decode('ascii')
+        self._decompress = METHODS[self.method][1]
+        self._count = (len(self._data) - HEADER.size) // RECORD.size
+        self._index = CaptureIndex(filename) if os.path.exists(index_filename(filename)) else None
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError('block number out of range')
+        return RECORD.unpack_from(self._data, HEADER.size + n * RECORD.size)
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._directory_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def read_block(self, n):
+        """return the decompressed data of one block"""
+        start, end, raw_offset, raw_size, offset, size, line = self[n]
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            return self._decompress(f.read(size))
+
+    def range_for_time(self, start=None, end=None):
+        """\
+        Return (start_offset, end_offset) in the uncompressed data covering
+        the given time window, like CaptureIndex.range_for_time. Without an
+        index the granularity is one block.
+        """
+        if self._index is not None:
+            return self._index.range_for_time(start, end)
+        start_offset = 0
+        if start is not None:
+            # the end times are monotonic, find the first block ending after start
+            n = bisect.bisect_left(_Column(self, 1), start)
+            start_offset = self[n][2] if n < self._count else self[-1][2] + self[-1][3]
+        end_offset = None
+        if end is not None:
+            n = bisect.bisect_right(_Column(self, 0), end)
+            if n < self._count:
+                end_offset = self[n][2]
+        return start_offset, end_offset
+
+    def iter_range(self, start=None, end=None):
+        """\
+        Yield the decompressed data of the given time window, block by block,
+        with the first and last one trimmed to the range (see
+        range_for_time). Blocks outside of the window are not read.
+        """
+        start_offset, end_offset = self.range_for_time(start, end)
+        # the block containing start_offset
+        n = max(bisect.bisect_right(_Column(self, 2), start_offset) - 1, 0)
+        with open(self.filename, 'rb') as f:
+            while n < self._count:
+                block_start, block_end, raw_offset, raw_size, offset, size, line = self[n]
+                if end_offset is not None and raw_offset >= end_offset:
+                    break
+                f.seek(offset)
+                data = self._decompress(f.read(size))
+                if raw_offset < start_offset or (end_offset is not None and raw_offset + raw_size > end_offset):
+                    data = data[max(start_offset - raw_offset, 0):
+                                None if end_offset is None else end_offset - raw_offset]
+                if data:
+                    yield data
+                n += 1
+
+    def extract(self, output_filename, start=None, end=None):
+        """write the uncompressed data of a time window into a new file"""
+        with open(output_filename, 'wb') as dst:
+            for data in self.iter_range(start, end):
+                dst.write(data)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+#
+# Sparse sidecar index for capture files.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+A capture file is accompanied by an index file (same name plus '.idx') that
+contains a sparse table of (timestamp, byte offset, line number) records. A
+record is added every time at least `interval` bytes were written since the
+previous one, so seeking by time or line is a binary search over the index
+followed by a short scan in the capture itself.
+"""
+
+import bisect
+import datetime
+import mmap
+import os
+import struct
+
+MAGIC = b'STIDX\x00\x01\x00'
+HEADER = struct.Struct('<8sQ')      # magic, interval
+RECORD = struct.Struct('<dQQ')      # timestamp, byte offset, line number
+
+DEFAULT_INTERVAL = 64 * 1024
+
+
+def index_filename(filename):
+    """return the name of the sidecar index for a capture file"""
+    return filename + '.idx'
+
+
+class IndexWriter(object):
+    """Append records to an index file"""
+
+    def __init__(self, filename, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self._file = open(filename, 'wb')
+        self._file.write(HEADER.pack(MAGIC, interval))
+        self._next_offset = 0
+
+    def update(self, timestamp, offset, line):
+        """\
+        Called before a chunk starting at `offset` is written. Adds a record
+        if the interval has been reached.
+        """
+        if offset >= self._next_offset:
+            self._file.write(RECORD.pack(timestamp, offset, line))
+            # keep the index usable for readers of a file that is still growing
+            self._file.flush()
+            self._next_offset = offset + self.interval
+
+    def close(self):
+        self._file.close()
+
+
+class _Column(object):
+    """Sequence view on one field of the index records, used for bisect"""
+
+    def __init__(self, index, field):
+        self._index = index
+        self._field = field
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, n):
+        return self._index[n][self._field]
+
+
+class CaptureIndex(object):
+    """\
+    Read access to a capture file and its index. The index is mapped into
+    memory so that only the records touched by the binary search are read.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._index_file = open(index_filename(filename), 'rb')
+        size = os.fstat(self._index_file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError('index file too short: {!r}'.format(index_filename(filename)))
+        try:
+            self._data = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # mmap not available (e.g. special file systems), fall back to reading it
+            self._data = self._index_file.read()
+        magic, self.interval = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError('not a capture index: {!r}'.format(index_filename(filename)))
+        self._count = (len(self._data) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError('index record out of range')
+        return RECORD.unpack_from(self._data, HEADER.size + n * RECORD.size)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def _find(self, field, value, inclusive=True):
+        """return the last record whose `field` is <= value (< value if not inclusive)"""
+        if inclusive:
+            n = bisect.bisect_right(_Column(self, field), value) - 1
+        else:
+            n = bisect.bisect_left(_Column(self, field), value) - 1
+        if n < 0:
+            return (0.0, 0, 0)
+        return self[n]
+
+    def offset_for_time(self, timestamp):
+        """\
+        Byte offset of the last indexed chunk received at or before the given
+        time. Data for that time is found at or after the returned offset.
+        """
+        return self._find(0, timestamp)[1]
+
+    def offset_for_line(self, line):
+        """byte offset of the start of the given (zero based) line"""
+        # a record with the same line number may point into the middle of it
+        _, offset, current = self._find(2, line, inclusive=False)
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            while current < line:
+                block = f.read(4096)
+                if not block:
+                    break
+                position = -1
+                while current < line:
+                    position = block.find(b'\n', position + 1)
+                    if position < 0:
+                        break
+                    current += 1
+                if current == line:
+                    return offset + position + 1
+                offset += len(block)
+        return offset
+
+    def range_for_time(self, start=None, end=None):
+        """\
+        Return (start_offset, end_offset) covering the given time window. The
+        granularity is one index interval, the range may contain a little more
+        data than requested, but never less. end_offset is None for "until the
+        end of the file".
+        """
+        start_offset = 0 if start is None else self.offset_for_time(start)
+        end_offset = None
+        if end is not None:
+            n = bisect.bisect_right(_Column(self, 0), end)
+            if n < self._count:
+                end_offset = self[n][1]
+        return start_offset, end_offset
+
+    def extract(self, output_filename, start=None, end=None, blocksize=65536):
+        """\
+        Copy the data of a time window into a new file. Only the selected part
+        of the capture is read.
+        """
+        start_offset, end_offset = self.range_for_time(start, end)
+        with open(self.filename, 'rb') as src, open(output_filename, 'wb') as dst:
+            src.seek(start_offset)
+            remaining = None if end_offset is None else end_offset - start_offset
+            while remaining is None or remaining > 0:
+                block = src.read(blocksize if remaining is None else min(blocksize, remaining))
+                if not block:
+                    break
+                dst.write(block)
+                if remaining is not None:
+                    remaining -= len(block)
+
+
+def parse_time(text):
+    """accept seconds since the epoch or an ISO 8601 date/time (local time)"""
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='pySerial-terminal capture index tool')
+    parser.add_argument('capture', help='capture file (index is expected next to it)')
+    parser.add_argument('--start', type=parse_time, help='start time (epoch or ISO 8601)')
+    parser.add_argument('--end', type=parse_time, help='end time (epoch or ISO 8601)')
+    parser.add_argument('--line', type=int, help='print the byte offset of this (zero based) line')
+    parser.add_argument('-o', '--output', help='extract the time window to this file')
+    args = parser.parse_args()
+
+    if os.path.exists(args.capture + '.blk'):
+        # compressed capture, only extraction is supported
+        from .compressed import CompressedCapture
+        with CompressedCapture(args.capture) as capture:
+            if args.output:
+                capture.extract(args.output, args.start, args.end)
+            else:
+                for data in capture.iter_range(args.start, args.end):
+                    sys.stdout.buffer.write(data)
+        return
+
+    with CaptureIndex(args.capture) as index:
+        if args.line is not None:
+            sys.stdout.write('{}\n'.format(index.offset_for_line(args.line)))
+        elif args.output:
+            index.extract(args.output, args.start, args.end)
+        else:
+            start_offset, end_offset = index.range_for_time(args.start, args.end)
+            sys.stdout.write('{} {}\n'.format(start_offset, '-' if end_offset is None else end_offset))
+
+
+if __name__ == '__main__':
+    main()
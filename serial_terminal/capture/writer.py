@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#
+# Write received data to a capture file.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import time
+
+from .index import IndexWriter, index_filename, DEFAULT_INTERVAL
+
+
+class CaptureWriter(object):
+    """\
+    Store raw data as received from the serial port and maintain a sparse
+    index next to it (see index.py).
+    """
+
+    def __init__(self, filename, index_interval=DEFAULT_INTERVAL):
+        self.filename = filename
+        self._file = open(filename, 'wb')
+        self._index = IndexWriter(index_filename(filename), index_interval)
+        self.offset = 0
+        self.line = 0
+
+    def write(self, data, timestamp=None):
+        """write a chunk of received bytes"""
+        if not data:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        self._index.update(timestamp, self.offset, self.line)
+        self._file.write(data)
+        self.offset += len(data)
+        self.line += data.count(b'\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def summary(self):
+        """return a one line description of the statistics"""
+        return '{} bytes, {} lines'.format(self.offset, self.line)
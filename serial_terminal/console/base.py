@@ -9,6 +9,8 @@
 
 import sys
 
+from .. import metrics
+
 class ConsoleBase(object):
     """OS abstraction for console (input/output codec, no echo)"""
 
@@ -33,15 +35,23 @@ class ConsoleBase(object):
         """Write bytes (already encoded)"""
         self.byte_output.write(byte_string)
         self.byte_output.flush()
+        metrics.thread_counters()['console_writes'] += 1
 
     def write(self, text):
         """Write string"""
         self.output.write(text)
         self.output.flush()
+        metrics.thread_counters()['console_writes'] += 1
 
     def cancel(self):
         """Cancel getkey operation"""
 
+    def write_status(self, text):
+        """\
+        Show text in the last line of the window, highlighted, without moving
+        the cursor ('' removes it). Consoles that can not do that ignore it.
+        """
+
     #  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -  -
     # context manager:
     # switch terminal temporary to normal mode (e.g. to get user input)
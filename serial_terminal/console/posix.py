@@ -11,6 +11,7 @@ from .base import ConsoleBase
 
 import atexit
 import fcntl
+import shutil
 import sys
 import termios
 import codecs
@@ -217,6 +218,14 @@ class Console(ConsoleBase):
     def cleanup(self):
         termios.tcsetattr(self.fd, termios.TCSAFLUSH, self.old)
 
+    def write_status(self, text):
+        """show text in the last line (save cursor, draw, restore cursor)"""
+        columns, lines = shutil.get_terminal_size()
+        if text:
+            self.write('\x1b7\x1b[{};1H\x1b[7m{}\x1b[0m\x1b[K\x1b8'.format(lines, text[:columns - 1]))
+        else:
+            self.write('\x1b7\x1b[{};1H\x1b[2K\x1b8'.format(lines))
+
     def set_ansi_color(self, colorcodes):
         """set color/intensity for next write(s)"""
 
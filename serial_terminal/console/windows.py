@@ -14,6 +14,7 @@ import sys
 import os
 from .base import ConsoleBase
 from ..terminal import constants
+from .. import metrics
 
 try:
     chr = unichr
@@ -295,6 +296,7 @@ class Console(ConsoleBase):
     def write_bytes(self, byte_str):
         self.byte_output.write(byte_str)
         self.byte_output.flush()
+        metrics.thread_counters()['console_writes'] += 1
 
     def write(self, text):
         """write text"""
@@ -305,6 +307,29 @@ class Console(ConsoleBase):
             len(text),
             ctypes.byref(chars_written),
             None)
+        metrics.thread_counters()['console_writes'] += 1
+
+    def write_status(self, text):
+        """show text in the last line of the window, the cursor is not moved"""
+        info = CONSOLE_SCREEN_BUFFER_INFO()
+        ctypes.windll.kernel32.GetConsoleScreenBufferInfo(self.handle, ctypes.byref(info))
+        width = info.srWindow.Right - info.srWindow.Left + 1
+        position = ctypes.wintypes._COORD(info.srWindow.Left, info.srWindow.Bottom)
+        chars_written = ctypes.wintypes.DWORD()
+        ctypes.windll.kernel32.WriteConsoleOutputCharacterW(
+            self.handle,
+            ctypes.c_wchar_p(text[:width - 1].ljust(width)),
+            width,
+            position,
+            ctypes.byref(chars_written))
+        # inverse for the status line, normal colors when it is removed
+        attrs = (ctypes.wintypes.WORD * width)(*[(GREY << 4) | BLACK if text else GREY] * width)
+        ctypes.windll.kernel32.WriteConsoleOutputAttribute(
+            self.handle,
+            ctypes.byref(attrs),
+            width,
+            position,
+            ctypes.byref(chars_written))
 
     def set_ansi_color(self, colorcodes):
         """set color/intensity for next write(s)"""
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Show received and sent data as hex dump.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import threading
+import time
+
+# translation table for the ASCII column, non printable bytes are shown as '.'
+ASCII_TABLE = bytes(b if 0x20 <= b < 0x7f else 0x2e for b in range(256))
+
+
+class HexDump:
+    """\
+    Render data as rows of offset, hex and ASCII columns. Complete rows are
+    formatted from one hex() and one translate() call for the whole chunk;
+    an incomplete row is shown and redrawn when more data arrives.
+    """
+
+    def __init__(self, console, width=16, group=1, timestamps=False, direction=False):
+        if width < 1 or group < 1 or width % group:
+            raise ValueError('row width must be a multiple of the group size')
+        self.console = console
+        self.width = width
+        self.group = group
+        self.timestamps = timestamps
+        self.direction = direction
+        # characters per row in the hex column of a whole chunk, incl. separator
+        self._hex_stride = width * 2 + width // group
+        self._hex_width = self._hex_stride - 1
+        self._direction = None
+        self._offsets = {}
+        self._row = bytearray()
+        self._row_time = None
+        self._second = None
+        self._second_text = None
+        # rx and tx (echo) are written from different threads
+        self._lock = threading.Lock()
+
+    def _format_time(self, t):
+        second = int(t)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime('%H:%M:%S', time.localtime(second))
+        return '{}.{:06d} '.format(self._second_text, int((t - second) * 1e6))
+
+    def _prefix(self, timestamp):
+        prefix = []
+        if self.timestamps:
+            prefix.append(self._format_time(timestamp))
+        if self.direction:
+            prefix.append('{} '.format(self._direction))
+        return ''.join(prefix)
+
+    def _format_rows(self, data, timestamp, complete):
+        """format data that starts at a row boundary, return text"""
+        hex_text = data.hex(' ', -self.group)
+        ascii_text = data.translate(ASCII_TABLE).decode('ascii')
+        prefix = self._prefix(timestamp)
+        rows = []
+        for n, start in enumerate(range(0, len(data), self.width)):
+            rows.append('{}{:08x}  {:<{}}  |{}|'.format(
+                prefix,
+                self._offsets.get(self._direction, 0) + start,
+                hex_text[n * self._hex_stride:n * self._hex_stride + self._hex_width],
+                self._hex_width,
+                ascii_text[start:start + self.width]))
+        text = '\n'.join(rows)
+        if complete:
+            text += '\n'
+        return text
+
+    def write(self, data, direction='RX', timestamp=None):
+        """add data, received (RX) or sent (TX)"""
+        if not data:
+            return
+        with self._lock:
+            self._write(data, direction, timestamp)
+
+    def _write(self, data, direction, timestamp):
+        if timestamp is None:
+            timestamp = time.time()
+        output = []
+        if direction != self._direction:
+            if self._row:
+                output.append('\n')    # leave the incomplete row as it is
+                self._offsets[self._direction] = self._offsets.get(self._direction, 0) + len(self._row)
+            self._direction = direction
+            self._row = bytearray()
+        if self._row:
+            # redraw the incomplete row with the new data
+            output.append('\r')
+            data = self._row + data
+        else:
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            self._row_time = timestamp
+        complete = len(data) - len(data) % self.width
+        if complete:
+            # rows are shown with the time of their first byte
+            output.append(self._format_rows(data[:complete], self._row_time, True))
+            self._offsets[direction] = self._offsets.get(direction, 0) + complete
+            self._row_time = timestamp
+        self._row = bytearray(data[complete:])
+        if self._row:
+            output.append(self._format_rows(self._row, self._row_time, False))
+        self.console.write(''.join(output))
+
+    def end_frame(self):
+        """finish the current row, offsets start from zero again"""
+        with self._lock:
+            if self._row:
+                self.console.write('\n')
+            self._row = bytearray()
+            self._offsets[self._direction] = 0
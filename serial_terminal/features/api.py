@@ -7,6 +7,9 @@
 #
 # SPDX-License-Identifier:    BSD-3-Clause
 
+import re
+import time
+
 
 class Feature:
     """Provide a base class for extensions of the terminal application"""
@@ -22,9 +25,80 @@ class Feature:
     def register_hotkey(self, key_name, callback):
         self.miniterm.hotkeys[key_name] = callback
 
+    def subscribe(self, hook, callback, threaded=False, max_queue=1 << 20, name=None):
+        """\
+        Call callback for each event of hook:
+
+        - 'rx': chunk of received bytes
+        - 'tx': chunk of bytes before it is sent
+        - 'key': bytes of a typed key before they are sent (also in 'tx')
+        - 'line': received line (bytes, without EOL)
+        - 'frame': received frame (a read-only memoryview), if framing is enabled
+
+        The callback runs in the thread that handles the data. If threaded
+        is true, it is called as callback(memoryview, timestamp) in a thread
+        of its own instead (the timestamp of received data is the time it was
+        read from the port), with up to max_queue bytes queued (see tap.Tap),
+        so that a slow callback does not stall the terminal. Hooks without
+        subscribers cost nothing. Return the subscription for unsubscribe().
+        """
+        try:
+            handlers = self.miniterm.hooks[hook]
+        except KeyError:
+            raise ValueError('unknown hook: {!r}'.format(hook))
+        if threaded:
+            from ..tap import Tap
+            if hook in ('rx', 'line', 'frame'):
+                def clock():
+                    # when it was read, not when the hook runs (after the display)
+                    return self.miniterm.rx_time
+            else:
+                clock = time.time
+            callback = Tap(
+                name or '{}_{}'.format(type(self).__name__.lower(), hook),
+                callback,
+                max_queue=max_queue,
+                clock=clock)
+            self.miniterm.taps.append(callback)
+        handlers.append(callback)
+        return callback
+
+    def unsubscribe(self, hook, subscription):
+        """end a subscription, threaded ones after the queued data was delivered"""
+        self.miniterm.hooks[hook].remove(subscription)
+        if subscription in self.miniterm.taps:
+            self.miniterm.taps.remove(subscription)
+            subscription.close()
+
+    def expect(self, pattern, timeout=None):
+        """\
+        Wait for a pattern in the received data and return the match object.
+        pattern can be text, bytes, a compiled regular expression or a list
+        of these; text is encoded with the current rx encoding. Raise
+        TimeoutError if it was not found within `timeout` seconds.
+        """
+        patterns = pattern if isinstance(pattern, (list, tuple)) else [pattern]
+        expect_buffer = self.miniterm.get_expect_buffer()
+        index, match = expect_buffer.expect([self._to_bytes_pattern(p) for p in patterns], timeout)
+        return match
+
+    def _to_bytes_pattern(self, pattern):
+        if isinstance(pattern, str):
+            return pattern.encode(self.miniterm.input_encoding)
+        if hasattr(pattern, 'search') and isinstance(pattern.pattern, str):
+            return re.compile(pattern.pattern.encode(self.miniterm.input_encoding), pattern.flags & ~re.UNICODE)
+        return pattern
+
+    def send(self, text):
+        """send text, transformations (e.g. EOL) are applied"""
+        self.miniterm.send(text)
+
     def start(self):
         """called by application when it is ready"""
 
+    def stop(self):
+        """called by application when it exits"""
+
     def message(self, text):
         """print a message to the console"""
         self.console.write(text.replace('\n', '\r\n'))
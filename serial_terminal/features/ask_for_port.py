@@ -8,7 +8,6 @@
 # SPDX-License-Identifier:    BSD-3-Clause
 
 from .api import Feature
-from serial.tools.list_ports import comports
 
 
 class AskForPort(Feature):
@@ -20,7 +19,7 @@ class AskForPort(Feature):
         """
         self.message('\n--- Available ports:\n')
         ports = []
-        for n, (port, desc, hwid) in enumerate(sorted(comports()), 1):
+        for n, (port, desc, hwid) in enumerate(self.port_list(), 1):
             self.message('--- {:2}: {:20} {}\n'.format(n, port, desc))
             ports.append(port)
         while True:
@@ -35,3 +34,13 @@ class AskForPort(Feature):
             else:
                 port = ports[index]
             return port
+
+    def port_list(self):
+        """the list of the port watcher, if there is one, else a new scan"""
+        watcher = self.miniterm.port_watcher
+        if watcher is not None:
+            ports = watcher.wait_for_ports()
+            if ports is not None:
+                return ports
+        from serial.tools.list_ports import comports
+        return sorted(comports())
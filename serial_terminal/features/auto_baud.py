@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# Find the baud rate of a device by looking at what it sends.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import threading
+import time
+
+from .api import Feature
+
+STANDARD_RATES = (115200, 9600, 57600, 38400, 19200, 230400, 460800, 921600, 4800, 2400, 1200)
+
+# bytes that are typical for a receiver running at the wrong speed: the
+# start bit is followed by a run of ones or zeros that should not be there
+FRAMING_SUSPECTS = frozenset(b'\x00\x80\xc0\xe0\xf0\xf8\xfc\xfe\xff')
+
+
+def score(data):
+    """\
+    Rate how plausible data is as text: 1.0 is clean printable text, values
+    near or below 0 are noise. Return None if there is no data.
+    """
+    if not data:
+        return None
+    text = data.decode('utf-8', 'replace')
+    good = sum(1 for c in text if c.isprintable() or c in '\r\n\t')
+    invalid = text.count('�')
+    suspects = sum(1 for b in data if b in FRAMING_SUSPECTS)
+    return good / len(text) - 0.5 * invalid / len(text) - 0.5 * suspects / len(data)
+
+
+class AutoBaud(Feature):
+    """\
+    Try baud rates in order, sample the received data for a short time at
+    each (optionally after sending a CR to provoke a prompt) and use the rate
+    with the best score. Stop early when the data looks clean.
+    """
+
+    def __init__(self, *args, rates=STANDARD_RATES, budget=5.0, send_cr=False,
+                 good_enough=0.95, min_bytes=16):
+        super().__init__(*args)
+        self.rates = rates
+        self.budget = budget
+        self.send_cr = send_cr
+        self.good_enough = good_enough
+        self.min_bytes = min_bytes
+
+    def sample(self, rate, window):
+        """return the data received within window seconds at rate"""
+        serial_instance = self.serial
+        serial_instance.baudrate = rate
+        serial_instance.reset_input_buffer()
+        if self.send_cr:
+            serial_instance.write(b'\r')
+        data = bytearray()
+        deadline = time.monotonic() + window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or len(data) >= 4096:
+                break
+            serial_instance.timeout = min(remaining, 0.05)
+            data += serial_instance.read(max(1, serial_instance.in_waiting))
+        return bytes(data)
+
+    def detect(self):
+        """return (best rate or None, [(rate, score, byte count), ...])"""
+        window = max(0.05, self.budget / len(self.rates))
+        t_end = time.monotonic() + self.budget
+        results = []
+        best_rate = None
+        best_score = None
+        for rate in self.rates:
+            if time.monotonic() >= t_end:
+                break
+            data = self.sample(rate, min(window, max(0.05, t_end - time.monotonic())))
+            rating = score(data)
+            results.append((rate, rating, len(data)))
+            if rating is not None and (best_score is None or rating > best_score):
+                best_rate, best_score = rate, rating
+            if rating is not None and rating >= self.good_enough and len(data) >= self.min_bytes:
+                break
+        return best_rate, results
+
+    def execute(self):
+        """detect with the reader paused, then use the result"""
+        self.miniterm._stop_reader()
+        try:
+            original_rate = self.serial.baudrate
+            original_timeout = self.serial.timeout
+            try:
+                self.message('\n--- detecting baud rate... ---\n')
+                rate, results = self.detect()
+            except Exception as e:
+                self.serial.baudrate = original_rate
+                self.message('--- ERROR detecting baud rate: {} ---\n'.format(e))
+                return
+            finally:
+                self.serial.timeout = original_timeout
+            for tried, rating, count in results:
+                self.message('---   {:>7}: {} ({} bytes)\n'.format(
+                    tried, 'no data' if rating is None else 'score {:.2f}'.format(rating), count))
+            if rate is None:
+                self.serial.baudrate = original_rate
+                self.message('--- no data received, keeping {} ---\n'.format(original_rate))
+            else:
+                self.serial.baudrate = rate
+                self.message('--- baud rate set to {} ---\n'.format(rate))
+        finally:
+            self.miniterm._start_reader()
+
+    def start(self):
+        # used as startup feature (--auto-baud)
+        threading.Thread(target=self.execute, name='auto-baud', daemon=True).start()
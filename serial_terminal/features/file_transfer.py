@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# XMODEM/YMODEM file transfer extension.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import mmap
+import time
+
+from .api import Feature
+from .send_file import format_duration
+from ..terminal import xmodem
+
+PROTOCOLS = {
+    'x': ('XMODEM', xmodem.XModem, {'block_size': 128}),
+    '1': ('XMODEM-1K', xmodem.XModem, {'block_size': 1024}),
+    'y': ('YMODEM', xmodem.YModem, {}),
+}
+
+
+class FileTransfer(Feature):
+    # {'menu_key': 'Ctrl+X'}
+
+    PROGRESS_INTERVAL = 0.25
+
+    def execute(self):
+        with self.console:
+            try:
+                protocol = self.ask_string('\n--- Protocol: [x]modem, xmodem-[1]k, [y]modem: ').strip().lower()
+                if protocol not in PROTOCOLS:
+                    self.message('--- unknown protocol ---\n')
+                    return
+                direction = self.ask_string('--- [s]end or [r]eceive: ').strip().lower()
+                if direction == 's':
+                    names = self.ask_string('--- File(s) to send: ').split()
+                elif direction == 'r':
+                    names = self.ask_string('--- {}: '.format(
+                        'Directory to save to' if protocol == 'y' else 'Save as')).split()
+                else:
+                    self.message('--- unknown direction ---\n')
+                    return
+            except KeyboardInterrupt:
+                self.message('--- canceled ---\n')
+                return
+            if not names:
+                return
+            self.transfer(protocol, direction == 's', names)
+
+    def transfer(self, protocol, send, names):
+        name, cls, kwargs = PROTOCOLS[protocol]
+        self.message('--- {} {} ---\n'.format(name, 'send' if send else 'receive'))
+        self._t_start = time.monotonic()
+        self._t_progress = 0
+        self._bytes = 0
+        transfer = cls(self.serial, progress=self.show_progress, **kwargs)
+        # the transfer needs exclusive access to the port
+        self.miniterm._stop_reader()
+        timeout = self.serial.timeout
+        try:
+            if protocol == 'y' and send:
+                transfer.send(names)
+            elif protocol == 'y':
+                for filename in transfer.receive(names[0]):
+                    self.message('\n--- received {} ---'.format(filename))
+            elif send:
+                with open(names[0], 'rb') as f:
+                    try:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (ValueError, OSError):
+                        data = f.read()
+                    try:
+                        transfer.send(data)
+                    finally:
+                        if isinstance(data, mmap.mmap):
+                            data.close()
+            else:
+                with open(names[0], 'wb') as f:
+                    transfer.receive(f)
+        except (xmodem.TransferError, IOError) as e:
+            self.message('\n--- ERROR: {} ---\n'.format(e))
+        else:
+            duration = time.monotonic() - self._t_start
+            self.message('\n--- {} bytes in {}, {:.1f} kB/s ---\n'.format(
+                self._bytes,
+                format_duration(duration),
+                self._bytes / duration / 1e3 if duration > 0 else 0))
+        finally:
+            self.serial.timeout = timeout
+            self.miniterm._start_reader()
+
+    def show_progress(self, position, total):
+        """called by the protocol after each block"""
+        self._bytes = position
+        now = time.monotonic()
+        if now - self._t_progress < self.PROGRESS_INTERVAL:
+            return
+        self._t_progress = now
+        speed = position / (now - self._t_start)
+        if total:
+            self.console.write('\r--- {:3.0f}% {}/{} bytes  {:.1f} kB/s  ETA {} '.format(
+                100.0 * position / total, position, total, speed / 1e3,
+                format_duration((total - position) / speed if speed else 0)))
+        else:
+            self.console.write('\r--- {} bytes  {:.1f} kB/s '.format(position, speed / 1e3))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Measure the time from a key press until its echo is shown.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import bisect
+import collections
+import threading
+import time
+
+from .api import Feature
+from .. import metrics
+
+
+def percentile(sorted_values, percent):
+    """nearest rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class EchoLatency(Feature):
+    """\
+    Each typed byte is timestamped and matched against the received data;
+    the time until the echo was displayed is recorded. Other transmitted data
+    (uploads, scripts) is not measured. Bytes that are not echoed within
+    `timeout` seconds (or more than `max_pending` bytes) are counted as lost.
+    The percentiles are of the last `max_samples` echoes. With `probes`,
+    that many keys are sent automatically (e.g. with loop:// to measure the
+    terminal's own latency or with a device that echoes).
+    """
+
+    LOOKAHEAD = 8       # skip up to this many unanswered bytes when matching
+
+    def __init__(self, *args, timeout=2.0, probes=0, probe_interval=0.05, max_samples=100000, max_pending=1024):
+        super().__init__(*args)
+        self.timeout = timeout
+        self.probes = probes
+        self.probe_interval = probe_interval
+        self.max_samples = max_samples
+        self.max_pending = max_pending
+        # in arrival order, and the same values sorted for the percentiles
+        self.samples = collections.deque()
+        self._sorted_samples = []
+        self.lost = 0
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self.subscribe('key', self.handle_key)
+        self.subscribe('rx', self.handle_rx)
+        for p in (50, 95, 99):
+            metrics.register_gauge('echo_latency_p{}_ms'.format(p), lambda p=p: self.percentile_ms(p))
+        metrics.register_gauge('echo_lost', lambda: self.lost)
+
+    def handle_key(self, data):
+        now = time.perf_counter()
+        with self._lock:
+            self._expire(now)
+            for byte in data:
+                self._pending.append((byte, now))
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.lost += 1
+
+    def handle_rx(self, data):
+        now = time.perf_counter()
+        with self._lock:
+            if not self._pending:
+                return
+            self._expire(now)
+            position = 0
+            while self._pending:
+                for skip, (byte, sent) in enumerate(self._pending):
+                    if skip == self.LOOKAHEAD:
+                        return
+                    found = data.find(byte, position)
+                    if found >= 0:
+                        break
+                else:
+                    return
+                # earlier bytes were not echoed (e.g. control keys)
+                self.lost += skip
+                for _ in range(skip + 1):
+                    self._pending.popleft()
+                self._add_sample(now - sent)
+                position = found + 1
+
+    def _add_sample(self, value):
+        """keep the last max_samples values, to be called with the lock held"""
+        if len(self.samples) == self.max_samples:
+            oldest = self.samples.popleft()
+            del self._sorted_samples[bisect.bisect_left(self._sorted_samples, oldest)]
+        self.samples.append(value)
+        bisect.insort(self._sorted_samples, value)
+
+    def _expire(self, now):
+        while self._pending and now - self._pending[0][1] > self.timeout:
+            self._pending.popleft()
+            self.lost += 1
+
+    def percentile_ms(self, percent):
+        with self._lock:
+            value = percentile(self._sorted_samples, percent)
+        return None if value is None else round(value * 1e3, 3)
+
+    def summary(self):
+        with self._lock:
+            values = list(self._sorted_samples)
+        if not values:
+            return 'no echoes, {} lost'.format(self.lost)
+        return 'n={} p50={:.2f} ms p95={:.2f} ms p99={:.2f} ms max={:.2f} ms, {} lost'.format(
+            len(values),
+            percentile(values, 50) * 1e3,
+            percentile(values, 95) * 1e3,
+            percentile(values, 99) * 1e3,
+            values[-1] * 1e3,
+            self.lost)
+
+    def start(self):
+        if self.probes:
+            self.thread = threading.Thread(target=self.probe, name='latency-probe')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def probe(self):
+        """send printable keys like typed ones and show the result"""
+        keys = 'abcdefghijklmnopqrstuvwxyz0123456789'
+        for n in range(self.probes):
+            if not self.miniterm.alive:
+                return
+            self.miniterm.send_key(keys[n % len(keys)])
+            time.sleep(self.probe_interval)
+        time.sleep(min(self.timeout, 0.5))
+        self.message('\n--- echo latency: {} ---\n'.format(self.summary()))
+
+    def stop(self):
+        self.message('--- echo latency: {} ---\n'.format(self.summary()))
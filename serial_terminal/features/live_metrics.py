@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# Show and export the counters of the data path.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import os
+import threading
+import time
+
+from .api import Feature
+from .. import metrics
+
+
+def format_rate(rate):
+    """bytes per second as short text"""
+    if rate < 1e3:
+        return '{:.0f} B/s'.format(rate)
+    elif rate < 1e6:
+        return '{:.1f} kB/s'.format(rate / 1e3)
+    return '{:.1f} MB/s'.format(rate / 1e6)
+
+
+class MetricsSampler(object):
+    """take snapshots and add rates and the line utilisation"""
+
+    def __init__(self, miniterm):
+        self.miniterm = miniterm
+        self.rates = metrics.Rates()
+
+    def sample(self):
+        values = metrics.snapshot()
+        try:
+            values['rx_waiting'] = self.miniterm.serial.in_waiting
+        except Exception:
+            pass
+        rates = self.rates.update(values)
+        rx_rate = rates.get('rx_bytes', 0.0)
+        tx_rate = rates.get('tx_bytes', 0.0)
+        return values, rates, {
+            'rx_line_utilisation_percent': metrics.line_utilisation(rx_rate, self.miniterm.serial),
+            'tx_line_utilisation_percent': metrics.line_utilisation(tx_rate, self.miniterm.serial),
+        }
+
+
+class StatusLine(Feature):
+    """toggle a status line with live counters at the bottom of the screen"""
+
+    def __init__(self, *args, interval=1.0):
+        super().__init__(*args)
+        self.interval = interval
+        self.thread = None
+        self.running = False
+
+    def execute(self):
+        if self.running:
+            self.running = False
+            self.thread.join()
+            self.console.write_status('')
+            self.message('--- status line off ---\n')
+        else:
+            self.running = True
+            self.thread = threading.Thread(target=self.update, name='status')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def update(self):
+        sampler = MetricsSampler(self.miniterm)
+        sampler.sample()
+        while self.running and self.miniterm.alive:
+            time.sleep(self.interval)
+            values, rates, utilisation = sampler.sample()
+            self.console.write_status(self.format(values, rates, utilisation))
+
+    @staticmethod
+    def format(values, rates, utilisation):
+        rx_util = utilisation['rx_line_utilisation_percent']
+        if values.get('echo_latency_p50_ms') is not None:
+            echo = ' echo p50/p95/p99 {echo_latency_p50_ms}/{echo_latency_p95_ms}/{echo_latency_p99_ms} ms '.format(
+                **values)
+        else:
+            echo = ''
+        return ' rx {} ({}) {} chunks/s  tx {}  wakeups {:.0f}/s  decode {:.0f}/{:.0f}/{:.0f}/s  '\
+               'render {:.0f}/s  writes {:.0f}/s  queued {} dropped {} '.format(
+                   format_rate(rates.get('rx_bytes', 0)),
+                   'n/a' if rx_util is None else '{:.1f}%'.format(rx_util),
+                   '{:.0f}'.format(rates.get('rx_chunks', 0)),
+                   format_rate(rates.get('tx_bytes', 0)),
+                   rates.get('reader_wakeups', 0),
+                   rates.get('decoder_text_runs', 0),
+                   rates.get('decoder_controls', 0),
+                   rates.get('decoder_sequence_bytes', 0),
+                   rates.get('render_flushes', 0),
+                   rates.get('console_writes', 0),
+                   sum(v for k, v in values.items() if k.endswith('_queued_bytes')) + values.get('rx_waiting', 0),
+                   sum(v for k, v in values.items() if k.endswith('_dropped_bytes'))) + echo
+
+
+class MetricsExport(Feature):
+    """periodically write the counters to a file, as JSON or Prometheus text"""
+
+    def __init__(self, *args, filename, format='json', interval=10.0):
+        super().__init__(*args)
+        if format not in ('json', 'prometheus'):
+            raise ValueError('unknown metrics format: {!r}'.format(format))
+        self.filename = filename
+        self.format = format
+        self.interval = interval
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='metrics')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        sampler = MetricsSampler(self.miniterm)
+        sampler.sample()
+        while self.miniterm.alive:
+            time.sleep(self.interval)
+            self.export(*sampler.sample())
+
+    def export(self, values, rates, utilisation):
+        port = getattr(self.serial, 'port', None)
+        if self.format == 'json':
+            text = metrics.to_json(
+                values,
+                rates={k: round(v, 3) for k, v in rates.items()},
+                port=port,
+                time=time.time(),
+                **utilisation) + '\n'
+        else:
+            text = metrics.to_prometheus(dict(values, **utilisation), labels={'port': port})
+        # replace the file at once, so that readers never see partial data
+        temporary = self.filename + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(text)
+        os.replace(temporary, self.filename)
@@ -8,30 +8,77 @@
 # SPDX-License-Identifier:    BSD-3-Clause
 
 from .api import Feature
-from . import ask_for_port, print_port_settings, send_file
 import serial
 
 
 class Menu(Feature):
-    def __init__(self, *args, hot_key='Ctrl+T'):
+    def __init__(self, *args, hot_key='Ctrl+T', upload_pacing=False):
         super().__init__(*args)
         self.hot_key = hot_key
+        self.upload_pacing = upload_pacing
+        self._raw_capture = None
+        self._status_line = None
         self.register_hotkey(hot_key, self.handle_menu_key)
 
+    # the features behind menu keys are imported on first use
+
+    @property
+    def raw_capture(self):
+        if self._raw_capture is None:
+            from . import raw_capture
+            self._raw_capture = raw_capture.RawCapture(self.miniterm)
+        return self._raw_capture
+
+    @property
+    def status_line(self):
+        if self._status_line is None:
+            from . import live_metrics
+            self._status_line = live_metrics.StatusLine(self.miniterm)
+        return self._status_line
+
     def start(self):
         self.message('--- Quit: {} | Menu: {} | Help: {} followed by Ctrl+H ---\r\n'.format(
             self.miniterm.exit_key,
             self.hot_key,
             self.hot_key))
 
+    def stop(self):
+        # close the file of a running capture
+        if self._raw_capture is not None:
+            self._raw_capture.stop()
+
     def handle_menu_key(self, key_name):
         """Implement a simple menu / settings"""
         c = self.console.getkey()  # read action key
+        try:
+            self.menu_command(c)
+        except serial.SerialException as e:
+            # e.g. settings that the port (or an attached session) does not support
+            self.message('--- ERROR: {} ---\n'.format(e))
+
+    def menu_command(self, c):
+        """execute the action for menu key c"""
         if c == self.hot_key or c == self.miniterm.exit_key:
             # Menu/exit character again -> send itself
             self.miniterm.send_key(c)
         elif c == 'Ctrl+U':  # upload file
-            send_file.SendFile(self.miniterm).execute()  # XXX
+            from . import send_file
+            send_file.SendFile(self.miniterm, pacing=self.upload_pacing).execute()  # XXX
+        elif c == 'Ctrl+X':  # XMODEM/YMODEM transfer
+            from . import file_transfer
+            file_transfer.FileTransfer(self.miniterm).execute()
+        elif c == 'Ctrl+W':  # start/stop raw capture
+            self.raw_capture.execute()
+        elif c == 'Ctrl+G':  # toggle status line with metrics
+            self.status_line.execute()
+        elif c == 'Ctrl+K':  # installed plug-ins
+            self.choose_plugin()
+        elif c == 'Ctrl+P':  # write profiling results
+            if self.miniterm.profiler is None:
+                self.message('--- profiling is not enabled (see --profile) ---\n')
+            else:
+                for filename in self.miniterm.profiler.dump():
+                    self.message('--- profile written: {} ---\n'.format(filename))
         elif c in ['Ctrl+H', 'h', 'H', '?']:  # Show help
             self.message(self.get_help_text())
         elif c == 'Ctrl+R':  # Toggle RTS
@@ -86,6 +133,7 @@ class Menu(Feature):
         elif c == 'Tab':  # info
             self.dump_port_settings()
         elif c in 'pP':                         # P -> change port
+            from . import ask_for_port
             try:
                 port = ask_for_port.AskForPort(self.miniterm).ask_for_port()
             except KeyboardInterrupt:
@@ -93,22 +141,17 @@ class Menu(Feature):
             if port and port != self.serial.port:
                 # reader thread needs to be shut down
                 self.miniterm._stop_reader()
-                # save settings
-                settings = self.serial.getSettingsDict()
+                # open with the same settings
+                from .reconnect import open_like
                 try:
-                    new_serial = serial.serial_for_url(port, do_not_open=True)
-                    # restore settings and open
-                    new_serial.applySettingsDict(settings)
-                    new_serial.rts = self.serial.rts
-                    new_serial.dtr = self.serial.dtr
-                    new_serial.open()
-                    new_serial.break_condition = self.serial.break_condition
+                    new_serial = open_like(self.serial, port)
                 except Exception as e:
                     self.message('--- ERROR opening new port: {} ---\n'.format(e))
-                    new_serial.close()
                 else:
                     self.serial.close()
                     self.miniterm.serial = new_serial
+                    if self.miniterm.port_watcher is not None:
+                        self.miniterm.port_watcher.set_current(port)
                     self.message('--- Port changed to: {} ---\n'.format(self.serial.port))
                 # and restart the reader thread
                 self.miniterm._start_reader()
@@ -122,6 +165,9 @@ class Menu(Feature):
                 self.serial.baudrate = backup
             else:
                 self.dump_port_settings()
+        elif c in 'aA':                         # A -> detect baud rate
+            from . import auto_baud
+            auto_baud.AutoBaud(self.miniterm).execute()
         elif c == '8':                          # 8 -> change to 8 bits
             self.serial.bytesize = serial.EIGHTBITS
             self.dump_port_settings()
@@ -163,8 +209,30 @@ class Menu(Feature):
         else:
             self.message('--- unknown menu key {} --\n'.format(c))
 
+    def choose_plugin(self):
+        """list the installed plug-ins and use the selected one"""
+        from .registry import run_plugin
+        plugins = list(self.miniterm.plugins)
+        if not plugins:
+            self.message('--- no plug-ins installed ---\n')
+            return
+        self.message('\n--- Plug-ins:\n')
+        for n, plugin in enumerate(plugins, 1):
+            self.message('--- {:2}: {}{}\n'.format(n, plugin, ' [loaded]' if plugin.loaded else ''))
+        try:
+            index = int(self.ask_string('--- Enter number: ').strip()) - 1
+            if not 0 <= index < len(plugins):
+                raise ValueError('no such plug-in')
+        except ValueError as e:
+            self.message('--- {} ---\n'.format(e))
+        except KeyboardInterrupt:
+            pass
+        else:
+            run_plugin(plugins[index], self.miniterm)
+
     def dump_port_settings(self):
         """Write current settings to console"""
+        from . import print_port_settings
         print_port_settings.PrintPortSettings(self.miniterm).execute()
         self.message('--- serial input encoding: {}\n'.format(self.miniterm.input_encoding))
         self.message('--- serial output encoding: {}\n'.format(self.miniterm.output_encoding))
@@ -184,6 +252,11 @@ class Menu(Feature):
 ---    {exit:7} Send the exit character itself to remote
 ---    Ctrl+I Show info
 ---    Ctrl+U Upload file (prompt will be shown)
+---    Ctrl+X XMODEM/YMODEM send/receive
+---    Ctrl+W start/stop raw capture to file
+---    Ctrl+G show/hide status line (data rates, counters)
+---    Ctrl+P write profiling results (with --profile)
+---    Ctrl+K list and use installed plug-ins
 ---    Ctrl+A encoding
 ---    Ctrl+F edit filters
 --- Toggles:
@@ -196,6 +269,7 @@ class Menu(Feature):
 ---    N E O S M  change parity (None, Even, Odd, Space, Mark)
 ---    1 2 3      set stop bits (1, 2, 1.5)
 ---    b          change baud rate
+---    a          detect baud rate
 ---    x X        disable/enable software flow control
 ---    r R        disable/enable hardware flow control
 """.format(version='XXX' or __version__, exit=self.miniterm.exit_key, menu=self.hot_key)
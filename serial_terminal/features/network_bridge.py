@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#
+# Share the serial session with network clients.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import collections
+import itertools
+import os
+import selectors
+import socket
+import threading
+
+from .api import Feature
+from .. import metrics
+
+
+def parse_address(address):
+    """\
+    Return (family, address) for 'HOST:PORT', ':PORT' (all interfaces) or
+    'unix:PATH'.
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[5:]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '', int(port))
+
+
+class Client(object):
+    """state of one connection"""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.queue = collections.deque()
+        self.pending = memoryview(b'')     # being sent, taken from the queue
+        self.queued = 0                     # bytes in queue and pending
+        self.dropped = 0
+        self.closing = False                # too slow, to be disconnected
+
+
+class BridgeServer(object):
+    """\
+    Send data to all connected clients and optionally accept data from them.
+    Each client has a bounded queue; if a client can not keep up, the oldest
+    queued data is dropped (or the client is disconnected), so a slow client
+    never blocks the caller of `broadcast`.
+
+    `write` is called with data from clients (None: read-only), `greeting`
+    is called for new clients and returns bytes to send first and `message`
+    reports connects and disconnects. `record` is called with all broadcast
+    data, under the same lock as `greeting`, so that a new client gets each
+    byte exactly once (e.g. from a scrollback buffer and then live).
+
+    Metrics: NAME_clients, NAME_queued_bytes and NAME_dropped_bytes, where
+    NAME is `metrics_name` with a number appended, so that several servers
+    do not collide.
+    """
+
+    _numbers = itertools.count(1)
+
+    SEND_SIZE = 65536   # queued chunks are joined up to this size for sending
+
+    def __init__(self, address, write=None, greeting=None, message=None, max_queue=1 << 20, drop_policy='drop',
+                 record=None, metrics_name='bridge'):
+        if drop_policy not in ('drop', 'disconnect'):
+            raise ValueError('unknown drop policy: {!r}'.format(drop_policy))
+        self.family, self.address = parse_address(address)
+        self.write = write
+        self.greeting = greeting
+        self.record = record
+        self.message = message or (lambda text: None)
+        self.max_queue = max_queue
+        self.drop_policy = drop_policy
+        self.alive = True
+        self.clients = {}
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_pending = False
+        self.server = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_UNIX:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+        else:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen(8)
+        self.server.setblocking(False)
+        self.metrics_name = '{}_{}'.format(metrics_name, next(self._numbers))
+        metrics.register_gauge('{}_clients'.format(self.metrics_name), lambda: len(self.clients))
+        metrics.register_gauge('{}_queued_bytes'.format(self.metrics_name),
+                               lambda: sum(c.queued for c in list(self.clients.values())))
+
+    @property
+    def name(self):
+        if self.family == socket.AF_UNIX:
+            return self.address
+        return '{}:{}'.format(*self.server.getsockname())
+
+    def broadcast(self, data):
+        """queue data for all clients, never blocks (thread safe)"""
+        if not self.clients and self.record is None:
+            return
+        data = bytes(data)
+        with self._lock:
+            if self.record is not None:
+                self.record(data)
+            for client in list(self.clients.values()):
+                self._enqueue(client, data)
+            self._wake()
+
+    def _enqueue(self, client, data):
+        if client.closing:
+            return
+        client.queue.append(data)
+        client.queued += len(data)
+        while client.queued > self.max_queue and client.queue:
+            if self.drop_policy == 'disconnect':
+                client.closing = True
+                client.queue.clear()
+                client.queued = len(client.pending)
+                break
+            dropped = client.queue.popleft()
+            client.queued -= len(dropped)
+            client.dropped += len(dropped)
+            metrics.thread_counters()['{}_dropped_bytes'.format(self.metrics_name)] += len(dropped)
+
+    def _wake(self):
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self._wakeup_w.send(b'\0')
+
+    def serve_forever(self, running=None):
+        """\
+        Accept clients and move data until `close` is called (or the optional
+        `running` callable returns False).
+        """
+        self._selector.register(self.server, selectors.EVENT_READ, self._accept)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, self._wakeup)
+        while self.alive and (running is None or running()):
+            for key, events in self._selector.select(timeout=1):
+                key.data(key.fileobj, events)
+        for client in list(self.clients.values()):
+            client.sock.close()
+        self.server.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        for kind in ('clients', 'queued_bytes'):
+            metrics.unregister_gauge('{}_{}'.format(self.metrics_name, kind))
+
+    def close(self):
+        self.alive = False
+        with self._lock:
+            self._wake()
+
+    def _accept(self, server, events):
+        sock, peer = server.accept()
+        sock.setblocking(False)
+        name = peer if isinstance(peer, str) and peer else '{}:{}'.format(*peer[:2]) if peer else 'unix'
+        client = Client(sock, name)
+        with self._lock:
+            if self.greeting is not None:
+                self._enqueue(client, self.greeting())
+            self.clients[sock] = client
+            self._wake()
+        self._selector.register(sock, selectors.EVENT_READ, self._service)
+        self.message('\n--- {} connected ---\n'.format(name))
+
+    def _wakeup(self, sock, events):
+        sock.recv(4096)
+        with self._lock:
+            self._wakeup_pending = False
+            pending = [c for c in self.clients.values() if c.queue or c.closing]
+        for client in pending:
+            if client.closing:
+                self._disconnect(client, 'too slow')
+            else:
+                self._selector.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, self._service)
+
+    def _service(self, sock, events):
+        client = self.clients.get(sock)
+        if client is None:
+            return
+        if events & selectors.EVENT_READ:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                data = b''
+            if not data:
+                self._disconnect(client, 'disconnected')
+                return
+            if self.write is not None:
+                self.write(data)
+        if events & selectors.EVENT_WRITE:
+            if not client.pending:
+                with self._lock:
+                    client.pending = memoryview(self._take(client))
+            try:
+                sent = sock.send(client.pending)
+            except OSError:
+                self._disconnect(client, 'disconnected')
+                return
+            client.pending = client.pending[sent:]
+            with self._lock:
+                client.queued -= sent
+                idle = not client.pending and not client.queue
+            if idle:
+                self._selector.modify(sock, selectors.EVENT_READ, self._service)
+
+    def _take(self, client):
+        """remove up to SEND_SIZE bytes of queued chunks, to be called with the lock held"""
+        chunks = []
+        size = 0
+        while client.queue and size < self.SEND_SIZE:
+            chunks.append(client.queue.popleft())
+            size += len(chunks[-1])
+        return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    def _disconnect(self, client, reason):
+        with self._lock:
+            self.clients.pop(client.sock, None)
+        self._selector.unregister(client.sock)
+        client.sock.close()
+        self.message('\n--- {} {} ({} bytes dropped) ---\n'.format(client.name, reason, client.dropped))
+
+
+class NetworkBridge(Feature):
+    """Share the session: received data goes to all clients of a BridgeServer"""
+
+    def __init__(self, *args, address=':7000', read_write=False, max_queue=1 << 20, drop_policy='drop'):
+        super().__init__(*args)
+        self.read_write = read_write
+        self.bridge = BridgeServer(
+            address,
+            write=self.handle_client_data if read_write else None,
+            message=self.message,
+            max_queue=max_queue,
+            drop_policy=drop_policy)
+        self.subscribe('rx', self.bridge.broadcast)
+
+    def handle_client_data(self, data):
+        self.miniterm.transmit(data)
+
+    def start(self):
+        self.message('--- sharing session on {} ({}) ---\n'.format(
+            self.bridge.name, 'read-write' if self.read_write else 'read-only'))
+        self.thread = threading.Thread(target=self.run, name='bridge')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """bridge thread, ends with the application"""
+        self.bridge.serve_forever(lambda: self.miniterm.alive)
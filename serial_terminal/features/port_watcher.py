@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+#
+# Keep the list of serial ports up to date in the background.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import os
+import select
+import threading
+import time
+
+from .api import Feature
+
+# inotify event flags (linux/inotify.h)
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+
+
+class DeviceChanges(object):
+    """\
+    Wait for changes of the device list: inotify on /dev where available
+    (Linux), else polling a cheap signature (the names in /dev) or, on
+    systems without /dev, a timeout after which the list is read again.
+    """
+
+    def __init__(self, directory='/dev', poll_interval=1.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._signature = None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                if libc.inotify_add_watch(
+                        fd, directory.encode(), IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        except (OSError, AttributeError):
+            pass
+        if self._fd is None:
+            self._signature = self.signature()
+
+    @property
+    def method(self):
+        if self._fd is not None:
+            return 'inotify'
+        return 'poll'
+
+    def signature(self):
+        try:
+            return frozenset(os.listdir(self.directory))
+        except OSError:
+            return None
+
+    def wait(self, timeout):
+        """return True if something changed (or may have changed) within timeout"""
+        if self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                return False
+            # devices come with several events (and udev adds links), settle first
+            time.sleep(0.2)
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+            return True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(0, deadline - time.monotonic())))
+            signature = self.signature()
+            if signature is None or signature != self._signature:
+                self._signature = signature
+                return True
+        return False
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def identity(port_info):
+    """what identifies a device when it comes back under a different name"""
+    if port_info.vid is None:
+        return None
+    return (port_info.vid, port_info.pid, port_info.serial_number or port_info.location)
+
+
+def describe(port_info):
+    text = 'VID:PID={:04X}:{:04X}'.format(port_info.vid, port_info.pid)
+    if port_info.serial_number:
+        text += ' SER={}'.format(port_info.serial_number)
+    return text
+
+
+class PortWatcher(Feature):
+    """\
+    Cache the port list (AskForPort shows it without delay) and tell the
+    user when the device of the current port comes back, e.g. after a reset
+    of a USB adapter. The first scan starts right away, so that it runs
+    while the application starts up and the port is asked for.
+    """
+
+    def __init__(self, *args, rescan_interval=30.0):
+        super().__init__(*args)
+        self.rescan_interval = rescan_interval
+        self.ports = None       # sorted list of ListPortInfo, once known
+        self.listeners = []     # called with (added, removed) lists
+        self._current_device = None
+        self._current = None    # identity of the port in use
+        self._current_missing = False
+        self._stopped = threading.Event()
+        self.changed = threading.Condition()
+        self.miniterm.port_watcher = self
+        self.thread = threading.Thread(target=self.run, name='port-watcher')
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def current(self):
+        """identity of the port in use (see identity()), None if unknown"""
+        return self._current
+
+    def set_current(self, device, port_identity=None):
+        """\
+        The port in use is now device. Its identity is looked up in the port
+        list, unless given (e.g. when the same device is back under another
+        name).
+        """
+        with self.changed:
+            self._current_device = device
+            self._current = port_identity if port_identity is not None else self.find_identity(device)
+            self._current_missing = False
+
+    def wait_for_ports(self, timeout=10):
+        """return the port list, waiting for the first scan if needed, or None"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.ports is not None, timeout)
+            return self.ports
+
+    def start(self):
+        self.set_current(getattr(self.serial, 'port', None))
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        # import here, in the background
+        from serial.tools.list_ports import comports
+        changes = DeviceChanges() if os.name == 'posix' else None
+        self.update(sorted(comports()))
+        with self.changed:
+            if self._current is None and self._current_device is not None:
+                self._current = self.find_identity(self._current_device)
+        while not self._stopped.is_set():
+            if changes is not None:
+                changes.wait(self.rescan_interval)
+            else:
+                time.sleep(2)
+            self.update(sorted(comports()))
+        if changes is not None:
+            changes.close()
+
+    def find_identity(self, device):
+        """return the identity of the device with this name (or a link to it), or None"""
+        if device is None:
+            return None
+        real = os.path.realpath(device)
+        for info in self.ports or []:
+            if info.device in (device, real):
+                return identity(info)
+        return None
+
+    def find_device(self, port_identity):
+        """return the current device name for an identity, or None"""
+        for info in self.ports or []:
+            if identity(info) == port_identity:
+                return info.device
+        return None
+
+    def update(self, ports):
+        old = {info.device: info for info in self.ports or []}
+        new = {info.device: info for info in ports}
+        added = [new[device] for device in new if device not in old or identity(new[device]) != identity(old[device])]
+        removed = [old[device] for device in old if device not in new]
+        with self.changed:
+            self.ports = ports
+            self.changed.notify_all()
+        if old and (added or removed):
+            self.report(added, removed)
+            for listener in list(self.listeners):
+                listener(added, removed)
+
+    def report(self, added, removed):
+        if self._current is None:
+            return
+        if any(identity(info) == self._current for info in removed):
+            self._current_missing = True
+            self.message('\n--- device of the port disappeared ---\n')
+        for info in added:
+            if identity(info) == self._current and self._current_missing:
+                self._current_missing = False
+                self.message('\n--- device {} is back as {} ---\n'.format(describe(info), info.device))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Capture received data to a file, bypassing the terminal emulation.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import threading
+import time
+
+from .api import Feature
+
+
+class RawCapture(Feature):
+    """\
+    While active, received data is written to a file instead of being
+    displayed. The capture ends when stopped from the menu, after an end
+    marker, a byte count or an idle timeout. Data after the end condition is
+    displayed normally.
+    """
+    # {'menu_key': 'Ctrl+W'}
+
+    PROGRESS_INTERVAL = 0.25
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._lock = threading.Lock()
+        self._file = None
+        self._monitor = None
+
+    @property
+    def active(self):
+        return self._file is not None
+
+    def execute(self):
+        """start or stop, asking for the settings when starting"""
+        if self.active:
+            self.stop()
+            return
+        with self.console:
+            try:
+                filename = self.ask_string('\n--- Capture to file: ').strip()
+                if not filename:
+                    return
+                marker = self.ask_string('--- End marker (empty: none): ')
+                count = self.ask_string('--- Byte count (empty: unlimited): ').strip()
+                idle = self.ask_string('--- Idle timeout in seconds (empty: none): ').strip()
+                self.start_capture(
+                    filename,
+                    end_marker=marker.encode(self.miniterm.input_encoding) if marker else None,
+                    byte_count=int(count) if count else None,
+                    idle_timeout=float(idle) if idle else None)
+            except KeyboardInterrupt:
+                self.message('--- canceled ---\n')
+            except (ValueError, IOError) as e:
+                self.message('--- ERROR: {} ---\n'.format(e))
+
+    def start_capture(self, filename, end_marker=None, byte_count=None, idle_timeout=None):
+        self.filename = filename
+        self.end_marker = end_marker
+        self.byte_count = byte_count
+        self.idle_timeout = idle_timeout
+        self.count = 0
+        self._tail = b''
+        self._t_start = self._t_last = time.monotonic()
+        self._file = open(filename, 'wb', buffering=1 << 20)
+        self.message('--- capturing to {} (menu, Ctrl+W to stop) ---\n'.format(filename))
+        self.miniterm.rx_sink = self.handle_rx
+        self._monitor = threading.Thread(target=self._show_progress, name='raw capture')
+        self._monitor.daemon = True
+        self._monitor.start()
+
+    def handle_rx(self, data):
+        """\
+        Called by the reader instead of the normal processing. Return data
+        that is not part of the capture (after the end condition).
+        """
+        with self._lock:
+            if self._file is None:
+                return data
+            self._t_last = time.monotonic()
+            end = len(data)
+            finished = False
+            if self.byte_count is not None:
+                end = min(end, self.byte_count - self.count)
+            if self.end_marker is not None:
+                # the marker may span chunks, search the tail of the previous one too
+                window = self._tail + bytes(data[:end])
+                position = window.find(self.end_marker)
+                if position >= 0:
+                    end = position + len(self.end_marker) - len(self._tail)
+                    finished = True
+                self._tail = window[-(len(self.end_marker) - 1):] if len(self.end_marker) > 1 else b''
+            self._file.write(data[:end])
+            self.count += end
+            if finished or end < len(data) or self.count == self.byte_count:
+                self._finish()
+                return data[end:]
+            return None
+
+    def stop(self):
+        with self._lock:
+            if self._file is not None:
+                self._finish()
+
+    def _finish(self):
+        """close the file and resume normal processing, to be called with the lock held"""
+        self.miniterm.rx_sink = None
+        self._file.close()
+        self._file = None
+        duration = time.monotonic() - self._t_start
+        self.message('\n--- captured {} bytes to {} in {:.1f} s ---\n'.format(self.count, self.filename, duration))
+
+    def _show_progress(self):
+        """thread: progress line and idle timeout"""
+        while True:
+            time.sleep(self.PROGRESS_INTERVAL)
+            with self._lock:
+                if self._file is None:
+                    break
+                now = time.monotonic()
+                if self.idle_timeout is not None and now - self._t_last >= self.idle_timeout:
+                    self._finish()
+                    break
+                duration = now - self._t_start
+                self.console.write('\r--- {} bytes  {:.1f} kB/s '.format(
+                    self.count, self.count / duration / 1e3 if duration > 0 else 0))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# Reopen the port when the device goes away, e.g. when an USB adapter resets.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import os
+import threading
+import time
+
+import serial
+
+from .api import Feature
+
+
+def open_like(serial_instance, port):
+    """open port with the settings and control line states of serial_instance"""
+    new_serial = serial.serial_for_url(port, do_not_open=True)
+    try:
+        new_serial.applySettingsDict(serial_instance.getSettingsDict())
+        new_serial.rts = serial_instance.rts
+        new_serial.dtr = serial_instance.dtr
+        new_serial.open()
+        new_serial.break_condition = serial_instance.break_condition
+    except Exception:
+        new_serial.close()
+        raise
+    return new_serial
+
+
+class Reconnect(Feature):
+    """\
+    When the reader gets an error, close the port and try to open it again,
+    with exponentially growing pauses. The port is found by its name or, if
+    the name is gone, by the USB VID:PID and serial number (with the port
+    watcher). Data sent in the mean time is kept (up to `buffer_size`
+    bytes) and sent after the reconnect if `buffer_size` is not 0.
+    """
+
+    def __init__(self, *args, initial_delay=0.1, max_delay=5.0, buffer_size=0):
+        super().__init__(*args)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.buffer_size = buffer_size
+        self._held = bytearray()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self.miniterm.reconnect = self
+
+    def resolve(self, port, port_identity):
+        """return the name under which the device is available now, or None"""
+        if '://' in port or os.path.exists(port):
+            return port
+        watcher = self.miniterm.port_watcher
+        if port_identity is not None and watcher is not None:
+            return watcher.find_device(port_identity)
+        return None
+
+    def handle_disconnect(self, exception):
+        """\
+        Called from the reader thread. Return True when the port is open
+        again (miniterm.serial is replaced), False when the application is
+        stopped in the mean time or when the port can not be reopened.
+        """
+        old_serial = self.miniterm.serial
+        self.miniterm.connected = False
+        try:
+            # open_like needs the settings, e.g. an attached session has none
+            old_serial.getSettingsDict()
+        except (AttributeError, serial.SerialException):
+            self.message('\n--- port lost ({}), it can not be reopened ---\n'.format(exception))
+            return False
+        watcher = self.miniterm.port_watcher
+        # recorded while the port was open, the device is usually gone by now
+        port_identity = watcher.current if watcher is not None else None
+        self.message('\n--- port lost ({}), reconnecting... ---\n'.format(exception))
+        try:
+            old_serial.close()
+        except Exception:
+            pass
+        delay = self.initial_delay
+        attempts = 0
+        t_start = time.monotonic()
+        while self.miniterm.alive and self.miniterm._reader_alive:
+            attempts += 1
+            port = self.resolve(old_serial.port, port_identity)
+            if port is not None:
+                try:
+                    new_serial = open_like(old_serial, port)
+                except (serial.SerialException, OSError, ValueError):
+                    pass
+                else:
+                    if watcher is not None:
+                        watcher.set_current(port, port_identity)
+                    self.message('--- reconnected to {} after {:.1f} s ({} attempts) ---\n'.format(
+                        port, time.monotonic() - t_start, attempts))
+                    self.flush_held(new_serial)
+                    return True
+            # wait, but do not miss the exit
+            deadline = time.monotonic() + delay
+            while self.miniterm.alive and time.monotonic() < deadline:
+                time.sleep(min(0.1, delay))
+            delay = min(delay * 2, self.max_delay)
+        return False
+
+    def hold(self, data):
+        """keep data that was sent while disconnected"""
+        with self._lock:
+            if self.miniterm.connected:
+                # reconnected since the caller checked, the held data is sent already
+                try:
+                    self.miniterm.serial.write(data)
+                    return
+                except serial.SerialException:
+                    pass
+            if len(self._held) + len(data) <= self.buffer_size:
+                self._held += data
+            else:
+                if not self._dropped:
+                    self.message('\n--- not connected, input is dropped ---\n')
+                self._dropped += len(data)
+
+    def flush_held(self, serial_instance):
+        """\
+        Send the held data to the new port, then publish the port. Both under
+        the lock, so that new input (see hold) can not overtake held data.
+        """
+        with self._lock:
+            if self._dropped:
+                self.message('--- {} bytes of input were dropped ---\n'.format(self._dropped))
+                self._dropped = 0
+            if self._held:
+                self.message('--- sending {} bytes typed while disconnected ---\n'.format(len(self._held)))
+                serial_instance.write(self._held)
+                self._held = bytearray()
+            self.miniterm.serial = serial_instance
+            self.miniterm.connected = True
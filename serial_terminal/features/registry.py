@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+# Discover features of other packages (plug-ins) through entry points.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Packages provide features with an entry point in the group
+"serial_terminal.features", e.g. in setup.py::
+
+    entry_points={'serial_terminal.features': ['logger = my_package.logger:Logger']}
+
+At start up only the entry point metadata is read; the module is imported
+and the class is instantiated the first time the plug-in is used (its hot
+key, the plug-in menu or --plugin to load it at start).
+"""
+
+import threading
+
+GROUP = 'serial_terminal.features'
+
+
+def entry_points(group=GROUP):
+    """return the entry points of group, without importing them"""
+    from importlib import metadata
+    try:
+        return list(metadata.entry_points(group=group))
+    except TypeError:
+        # Python < 3.10
+        return list(metadata.entry_points().get(group, []))
+
+
+class Plugin(object):
+    """metadata of a plug-in, with the feature created on first use"""
+
+    def __init__(self, name, value, distribution=None, entry_point=None):
+        self.name = name
+        self.value = value
+        self.distribution = distribution
+        self._entry_point = entry_point
+        self._feature = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._feature is not None
+
+    def load_class(self):
+        if self._entry_point is not None:
+            return self._entry_point.load()
+        import importlib
+        module_name, _, attribute = self.value.partition(':')
+        obj = importlib.import_module(module_name)
+        for part in attribute.split('.'):
+            obj = getattr(obj, part)
+        return obj
+
+    def feature(self, miniterm):
+        """import and instantiate the feature on the first call"""
+        with self._lock:
+            if self._feature is None:
+                feature = self.load_class()(miniterm)
+                # started now and stopped on exit like the built-in features
+                miniterm.add_feature(feature)
+                self._feature = feature
+            return self._feature
+
+    def __str__(self):
+        if self.distribution:
+            return '{} ({}, from {})'.format(self.name, self.value, self.distribution)
+        return '{} ({})'.format(self.name, self.value)
+
+
+class FeatureRegistry(object):
+    """all plug-ins by name"""
+
+    def __init__(self):
+        self.plugins = {}
+
+    def discover(self, group=GROUP):
+        for entry_point in entry_points(group):
+            dist = getattr(entry_point, 'dist', None)
+            self.add(Plugin(
+                entry_point.name,
+                entry_point.value,
+                '{} {}'.format(dist.name, dist.version) if dist is not None else None,
+                entry_point))
+        return self
+
+    def add(self, plugin):
+        self.plugins[plugin.name] = plugin
+
+    def __getitem__(self, name):
+        try:
+            return self.plugins[name]
+        except KeyError:
+            raise KeyError('unknown plug-in: {!r} (available: {})'.format(
+                name, ', '.join(sorted(self.plugins)) or 'none'))
+
+    def __iter__(self):
+        return iter(sorted(self.plugins.values(), key=lambda p: p.name))
+
+    def __len__(self):
+        return len(self.plugins)
+
+
+def run_plugin(plugin, miniterm, key_name=None):
+    """use a plug-in from a key: load it and call its execute() method if it has one"""
+    try:
+        feature = plugin.feature(miniterm)
+    except Exception as e:
+        miniterm.console.write('--- plug-in {} failed to load: {} ---\r\n'.format(plugin.name, e))
+        return
+    execute = getattr(feature, 'execute', None)
+    if execute is not None:
+        execute()
+    else:
+        miniterm.console.write('--- plug-in {} loaded ---\r\n'.format(plugin.name))
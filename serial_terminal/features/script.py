@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+# Run a Python script that interacts with the device.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+The script runs in its own thread, next to the interactive terminal. These
+names are available in it:
+
+    expect(pattern, timeout=None)   wait for text or a regular expression
+    send(text)                      send text (EOL conversion applies)
+    message(text)                   print a message on the console
+    sleep(seconds)                  time.sleep
+    stop()                          exit the terminal
+    miniterm, serial                the application and the serial port
+
+e.g.::
+
+    expect('=>')
+    send('boot\\n')
+    expect('login:', timeout=30)
+"""
+
+import threading
+import time
+import traceback
+
+from .api import Feature
+
+
+class Script(Feature):
+    def __init__(self, *args, filename=None):
+        super().__init__(*args)
+        self.filename = filename
+        with open(filename) as f:
+            self.code = compile(f.read(), filename, 'exec')
+        self.thread = None
+
+    def start(self):
+        # collect data from the start on, not only from the first expect() call
+        self.miniterm.get_expect_buffer()
+        self.thread = threading.Thread(target=self.run, name='script')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        namespace = {
+            '__name__': '__script__',
+            '__file__': self.filename,
+            'expect': self.expect,
+            'send': self.send,
+            'message': self.message,
+            'sleep': time.sleep,
+            'stop': self.miniterm.stop,
+            'miniterm': self.miniterm,
+            'serial': self.serial,
+        }
+        try:
+            exec(self.code, namespace)
+        except Exception:
+            self.message('\n--- script {} failed:\n{}'.format(self.filename, traceback.format_exc()))
+        else:
+            self.message('\n--- script {} finished ---\n'.format(self.filename))
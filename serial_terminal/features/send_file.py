@@ -2,16 +2,40 @@
 #
 # Send file contents extension
 #
-# This file is part of pySerial. https://github.com/pyserial/pyserial-terminal
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
 # (C) 2018 Chris Liechti <cliechti@gmx.net>
 #
 # SPDX-License-Identifier:    BSD-3-Clause
 
+import mmap
+import os
+import time
+
 from .api import Feature
 
+
+def bytes_per_second(serial_instance):
+    """estimate the throughput of the line from the port settings"""
+    parity_bits = 0 if serial_instance.parity == 'N' else 1
+    bits = 1 + serial_instance.bytesize + parity_bits + serial_instance.stopbits
+    return max(1, serial_instance.baudrate) / bits
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return '{}:{:02d}'.format(minutes, seconds)
+
+
 class SendFile(Feature):
     # {'menu_key': 'Ctrl+U'}
 
+    # seconds between updates of the progress line
+    PROGRESS_INTERVAL = 0.25
+
+    def __init__(self, *args, pacing=False):
+        super().__init__(*args)
+        self.pacing = pacing
+
     def execute(self):
         self.message('\n--- File to upload: ')
         with self.console:
@@ -20,14 +44,69 @@ class SendFile(Feature):
                 try:
                     with open(filename, 'rb') as f:
                         self.message('--- Sending file {} ---\n'.format(filename))
-                        while True:
-                            block = f.read(1024)
-                            if not block:
-                                break
-                            self.serial.write(block)
-                            # Wait for output buffer to drain.
-                            self.serial.flush()
-                            self.message('.')   # Progress indicator.
+                        self.send_file(f)
                     self.message('\n--- File {} sent ---\n'.format(filename))
                 except IOError as e:
                     self.message('--- ERROR opening file {}: {} ---\n'.format(filename, e))
+
+    def send_file(self, f):
+        """send the contents of an open (binary) file"""
+        size = os.fstat(f.fileno()).st_size
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # empty files and special files can not be mapped
+            data = f.read()
+        try:
+            self._send_data(memoryview(data), size or len(data))
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def _send_data(self, view, size):
+        rate = bytes_per_second(self.serial)
+        # blocks of ~100ms of line time, the output buffer is kept filled
+        # with up to two blocks instead of draining it after each one
+        block_size = max(256, min(65536, int(rate / 10)))
+        high_water = 2 * block_size
+        t_start = time.monotonic()
+        t_progress = 0
+        position = 0
+        while position < size:
+            # a copy: taps and handlers may keep it after the file is closed
+            block = bytes(view[position:position + block_size])
+            self.miniterm.transmit(block)
+            position += len(block)
+            now = time.monotonic()
+            if self.pacing:
+                # do not send faster than the line settings allow
+                ahead = position / rate - (now - t_start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            else:
+                waiting = self._out_waiting()
+                if waiting > high_water:
+                    time.sleep((waiting - high_water) / rate)
+            if now - t_progress >= self.PROGRESS_INTERVAL:
+                t_progress = now
+                self.show_progress(position, size, now - t_start)
+        # wait for the rest of the data to leave the output buffer
+        self.serial.flush()
+        self.show_progress(position, size, time.monotonic() - t_start)
+
+    def _out_waiting(self):
+        try:
+            return self.serial.out_waiting
+        except (AttributeError, NotImplementedError, IOError):
+            # not supported, rely on write() blocking
+            return 0
+
+    def show_progress(self, position, size, duration):
+        speed = position / duration if duration > 0 else 0
+        eta = (size - position) / speed if speed else 0
+        self.console.write('\r--- {:3.0f}% {}/{} bytes  {:.1f} kB/s  ETA {} '.format(
+            100.0 * position / size if size else 100.0,
+            position,
+            size,
+            speed / 1e3,
+            format_duration(eta)))
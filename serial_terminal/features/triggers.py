@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# React on patterns in the received data.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Triggers are read from a file, one per line: an action, white space and the
+pattern. Patterns starting with "re:" are regular expressions, all others
+are literal text. Empty lines and lines starting with "#" are ignored.
+
+Actions:
+    highlight       show a highlighted message with the match
+    bell            ring the bell
+    log=FILE        append time and match to FILE
+    send=TEXT       send TEXT (backslash escapes like \\r are supported)
+
+e.g.::
+
+    highlight   Kernel panic
+    bell        re:assert(ion)? failed
+    send=root\\r login:
+"""
+
+import codecs
+import time
+
+from .api import Feature
+from ..terminal.matching import MultiMatcher
+
+
+def parse_triggers(lines):
+    """return a list of (action, argument, pattern, is_regex) tuples"""
+    triggers = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            action, pattern = line.split(None, 1)
+        except ValueError:
+            raise ValueError('line {}: expected action and pattern'.format(line_number))
+        action, _, argument = action.partition('=')
+        if action not in ('highlight', 'bell', 'log', 'send'):
+            raise ValueError('line {}: unknown action {!r}'.format(line_number, action))
+        if action in ('log', 'send') and not argument:
+            raise ValueError('line {}: {} needs an argument'.format(line_number, action))
+        if action == 'send':
+            argument = codecs.decode(argument, 'unicode_escape')
+        if pattern.startswith('re:'):
+            triggers.append((action, argument, pattern[3:], True))
+        else:
+            triggers.append((action, argument, pattern, False))
+    return triggers
+
+
+class Triggers(Feature):
+    """Watch the received data for patterns and run actions"""
+
+    def __init__(self, *args, filename=None, encoding='UTF-8'):
+        super().__init__(*args)
+        with open(filename, encoding='utf-8') as f:
+            triggers = parse_triggers(f)
+        literals = []
+        expressions = []
+        self._actions = {'literal': [], 'regex': []}
+        for action, argument, pattern, is_regex in triggers:
+            if is_regex:
+                expressions.append(pattern.encode(encoding))
+                self._actions['regex'].append((action, argument))
+            else:
+                literals.append(pattern.encode(encoding))
+                self._actions['literal'].append((action, argument))
+        self.matcher = MultiMatcher(literals, expressions)
+        self.encoding = encoding
+        self._logs = {}
+        self.subscribe('rx', self.handle_rx)
+
+    def stop(self):
+        for log in self._logs.values():
+            log.close()
+        self._logs.clear()
+
+    def handle_rx(self, data):
+        """called by the reader thread for each received chunk"""
+        # the matches are in stream order, literals and expressions mixed
+        for kind, index, match in self.matcher.feed(data):
+            action, argument = self._actions[kind][index]
+            getattr(self, 'do_' + action)(argument, match.decode(self.encoding, 'replace'))
+
+    def do_highlight(self, argument, match):
+        self.message('\n\x1b[7m--- trigger: {} ---\x1b[0m\n'.format(match))
+
+    def do_bell(self, argument, match):
+        self.console.write('\a')
+
+    def do_log(self, argument, match):
+        if argument not in self._logs:
+            self._logs[argument] = open(argument, 'a', encoding='utf-8')
+        log = self._logs[argument]
+        log.write('{} {}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S'), match))
+        log.flush()
+
+    def do_send(self, argument, match):
+        self.miniterm.transmit(argument.encode(self.miniterm.output_encoding, 'replace'))
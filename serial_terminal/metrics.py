@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# Lightweight counters for the data path.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Each thread increments its own dictionary of counters, so the hot path
+needs no locks: get it once with thread_counters() and then use
+``counters['rx_bytes'] += len(data)``. snapshot() adds up the counters of
+all threads and evaluates the registered gauges (e.g. queue depths).
+"""
+
+import collections
+import threading
+import time
+
+_local = threading.local()
+_lock = threading.Lock()
+_thread_counters = []
+_gauges = {}
+
+
+def thread_counters():
+    """return the counters of the calling thread"""
+    try:
+        return _local.counters
+    except AttributeError:
+        counters = _local.counters = collections.defaultdict(int)
+        with _lock:
+            _thread_counters.append(counters)
+        return counters
+
+
+def register_gauge(name, function):
+    """function is called on each snapshot and returns the current value"""
+    with _lock:
+        _gauges[name] = function
+
+
+def unregister_gauge(name):
+    with _lock:
+        _gauges.pop(name, None)
+
+
+def snapshot():
+    """return a dict with the sum of all counters and the current gauge values"""
+    totals = collections.defaultdict(int)
+    with _lock:
+        threads = list(_thread_counters)
+        gauges = list(_gauges.items())
+    for counters in threads:
+        # copy() is atomic, iterating the live dict is not
+        for name, value in counters.copy().items():
+            totals[name] += value
+    for name, function in gauges:
+        try:
+            totals[name] = function()
+        except Exception:
+            pass
+    return dict(totals)
+
+
+def bits_per_character(serial_instance):
+    """number of bits on the line for each byte, including start and stop bits"""
+    return 1 + serial_instance.bytesize + (serial_instance.parity != 'N') + serial_instance.stopbits
+
+
+class Rates(object):
+    """calculate per second rates from consecutive snapshots"""
+
+    def __init__(self):
+        self._last = {}
+        self._last_time = None
+
+    def update(self, values, now=None):
+        """return {name: rate} for all counters since the last call"""
+        now = time.monotonic() if now is None else now
+        rates = {}
+        if self._last_time is not None and now > self._last_time:
+            duration = now - self._last_time
+            for name, value in values.items():
+                rates[name] = (value - self._last.get(name, 0)) / duration
+        self._last = values
+        self._last_time = now
+        return rates
+
+
+def line_utilisation(byte_rate, serial_instance):
+    """percentage of the baud rate used by byte_rate bytes per second"""
+    try:
+        return 100.0 * byte_rate * bits_per_character(serial_instance) / serial_instance.baudrate
+    except (AttributeError, TypeError, ZeroDivisionError):
+        return None
+
+
+def to_json(values, **extra):
+    import json     # only needed for exports
+    values = dict(values, **extra)
+    return json.dumps(values, sort_keys=True)
+
+
+def to_prometheus(values, prefix='serial_terminal_', labels=None):
+    """format values in the Prometheus text exposition format"""
+    label_text = ''
+    if labels:
+        label_text = '{' + ','.join(
+            '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+            for k, v in sorted(labels.items())) + '}'
+    lines = []
+    for name, value in sorted(values.items()):
+        if value is None:
+            continue
+        lines.append('{}{}{} {}'.format(prefix, name, label_text, value))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+#
+# Profiling support for diagnostics: per thread cProfile, a sampling
+# profiler, per stage timers and tracemalloc snapshots.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import cProfile
+import collections
+import marshal
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_MODES = ('cprofile', 'sample', 'timers')
+STAGES = ('read', 'decode', 'emulate', 'render', 'write')
+
+# since Python 3.12, cProfile is built on sys.monitoring: only one profiler
+# can be active at a time, and it sees all threads
+SHARED_CPROFILE = sys.version_info >= (3, 12)
+
+
+class Histogram(object):
+    """durations in buckets of powers of two microseconds"""
+
+    def __init__(self):
+        self.buckets = [0] * 32
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        # some stages are timed in several threads (e.g. console writes)
+        self._lock = threading.Lock()
+
+    def add(self, duration):
+        bucket = min(int(duration * 1e6).bit_length(), 31)
+        with self._lock:
+            self.buckets[bucket] += 1
+            self.count += 1
+            self.total += duration
+            if duration > self.maximum:
+                self.maximum = duration
+
+    def percentile(self, percent):
+        """upper bound (in seconds) of the bucket containing the percentile"""
+        limit = self.count * percent / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= limit:
+                return (1 << bucket) / 1e6
+        return 0.0
+
+    def format(self, name):
+        if not self.count:
+            return '{:8} no samples\n'.format(name)
+        lines = ['{:8} n={} mean={:.1f}us p50<{:.0f}us p99<{:.0f}us max={:.1f}us\n'.format(
+            name, self.count, self.total / self.count * 1e6,
+            self.percentile(50) * 1e6, self.percentile(99) * 1e6, self.maximum * 1e6)]
+        peak = max(self.buckets)
+        for bucket, count in enumerate(self.buckets):
+            if count:
+                lines.append('    <{:>9}us {:>9} {}\n'.format(1 << bucket, count, '#' * (40 * count // peak or 1)))
+        return ''.join(lines)
+
+
+class StageTimers(object):
+    """one histogram per stage of the data path"""
+
+    def __init__(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def add(self, stage, duration):
+        self.histograms[stage].add(duration)
+
+    def timed(self, stage, function):
+        """return function wrapped with a timer for stage"""
+        histogram = self.histograms[stage]
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.add(time.perf_counter() - start)
+        return wrapper
+
+    def format(self):
+        return ''.join(self.histograms[stage].format(stage) for stage in STAGES)
+
+
+class SamplingProfiler(object):
+    """\
+    Periodically look at the stacks of all threads and count them, the
+    result is in the "folded" format used by flame graph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='sampler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        own = threading.get_ident()
+        while self.running:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def format(self):
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in self.stacks.most_common())
+
+
+class Profiler(object):
+    """\
+    Collect profiling data according to mode and write it to files starting
+    with prefix, e.g. prefix-rx.prof (for pstats or snakeviz),
+    prefix-samples.folded, prefix-stages.txt and prefix-memory-N.txt.
+
+    cProfile data is collected per thread (prefix-rx.prof, prefix-tx.prof)
+    or, where only one profiler can be active (SHARED_CPROFILE), for all
+    threads together in prefix-threads.prof.
+    """
+
+    def __init__(self, mode='timers', prefix='serial_terminal-profile', memory=False):
+        if mode not in PROFILE_MODES:
+            raise ValueError('unknown profile mode: {!r}'.format(mode))
+        self.mode = mode
+        self.prefix = prefix
+        self.timers = StageTimers()
+        self.profiles = {}
+        self.sampler = None
+        self.memory = memory
+        self._memory_snapshots = []
+        if mode == 'sample':
+            self.sampler = SamplingProfiler()
+            self.sampler.start()
+        elif mode == 'cprofile' and SHARED_CPROFILE:
+            profile = cProfile.Profile()
+            profile.enable()
+            self.profiles['threads'] = profile
+        if memory:
+            tracemalloc.start(25)
+
+    def wrap(self, function, name):
+        """return a thread target that runs function under cProfile if enabled"""
+        if self.mode != 'cprofile' or SHARED_CPROFILE:
+            return function
+
+        def profiled(*args, **kwargs):
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def dump(self):
+        """write all collected data to files, return the list of file names"""
+        filenames = []
+        for name, profile in list(self.profiles.items()):
+            filename = '{}-{}.prof'.format(self.prefix, name)
+            # snapshot_stats does not disable the profiler (unlike dump_stats)
+            # so this also works while the thread is running
+            profile.snapshot_stats()
+            with open(filename, 'wb') as f:
+                marshal.dump(profile.stats, f)
+            filenames.append(filename)
+        if self.sampler is not None:
+            filename = '{}-samples.folded'.format(self.prefix)
+            with open(filename, 'w') as f:
+                f.write(self.sampler.format())
+            filenames.append(filename)
+        filename = '{}-stages.txt'.format(self.prefix)
+        with open(filename, 'w') as f:
+            f.write(self.timers.format())
+        filenames.append(filename)
+        if self.memory:
+            filenames.extend(self.dump_memory())
+        return filenames
+
+    def dump_memory(self):
+        """save a tracemalloc snapshot and the top differences to the previous one"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        index = len(self._memory_snapshots)
+        snapshot_filename = '{}-memory-{}.snapshot'.format(self.prefix, index)
+        snapshot.dump(snapshot_filename)
+        if self._memory_snapshots:
+            statistics = snapshot.compare_to(self._memory_snapshots[-1], 'lineno')
+            title = 'growth since snapshot {}'.format(index - 1)
+        else:
+            statistics = snapshot.statistics('lineno')
+            title = 'largest allocations'
+        self._memory_snapshots.append(snapshot)
+        text_filename = '{}-memory-{}.txt'.format(self.prefix, index)
+        with open(text_filename, 'w') as f:
+            f.write('{}, total {} kB\n'.format(
+                title, sum(s.size for s in snapshot.statistics('filename')) // 1024))
+            for statistic in statistics[:30]:
+                f.write('{}\n'.format(statistic))
+        return [snapshot_filename, text_filename]
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+        if SHARED_CPROFILE and 'threads' in self.profiles:
+            self.profiles['threads'].disable()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+#
+# Detachable sessions: keep a port open in a server process and attach
+# terminals to it over a Unix socket.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import codecs
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+import serial
+
+from .features.network_bridge import BridgeServer
+from .terminal.escape_decoder import EscapeDecoder
+
+# erase display, as used by full screen applications
+CLEAR_SCREEN = (b'\x1b[2J', b'\x1bc')
+
+
+def session_directory():
+    """directory for the session sockets of this user"""
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        return os.path.join(base, 'serial_terminal')
+    return os.path.join(tempfile.gettempdir(), 'serial_terminal-{}'.format(os.getuid()))
+
+
+def socket_path(name):
+    """return the socket path for a session name (a path is used as is)"""
+    if os.sep in name:
+        return name
+    return os.path.join(session_directory(), name + '.sock')
+
+
+def session_name(port):
+    """default session name for a port, e.g. 'ttyUSB0' for '/dev/ttyUSB0'"""
+    return os.path.basename(port.rstrip('/')).replace(':', '_') or 'session'
+
+
+class ScreenState(object):
+    """\
+    Follow the SGR attributes and the cursor position of a terminal screen
+    of `columns` x `rows` through the received data (parsed by
+    EscapeDecoder), so that a replayed snapshot can start in the same state.
+    Controls that do not change these are ignored. The position is only
+    restored once the device moved the cursor itself, plain line output
+    continues where the client's cursor is.
+    """
+
+    def __init__(self, columns=80, rows=24):
+        self.columns = columns
+        self.rows = rows
+        self.x = 0
+        self.y = 0
+        self.sgr = []       # SGR parameter groups since the last reset
+        self._saved = (0, 0)
+        self.positioned = False
+        self._decoder = EscapeDecoder(self, error_handler=lambda e: None)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def __getattr__(self, name):
+        # all other handler methods of EscapeDecoder
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+    def copy(self):
+        state = ScreenState(self.columns, self.rows)
+        state.x, state.y, state.sgr, state._saved = self.x, self.y, list(self.sgr), self._saved
+        state.positioned = self.positioned
+        return state
+
+    def feed(self, data):
+        self._decoder.feed(data)
+
+    def sequence(self):
+        """return the escape sequences that restore the state"""
+        sequence = '\x1b[0m'
+        if self.sgr:
+            sequence += '\x1b[{}m'.format(';'.join(str(p) for group in self.sgr for p in group))
+        if self.positioned:
+            sequence += '\x1b[{};{}H'.format(self.y + 1, min(self.x, self.columns - 1) + 1)
+        return sequence.encode('ascii')
+
+    def write(self, data):
+        self.x += len(self._text_decoder.decode(data))
+        # the cursor stays in the last column until the next character
+        while self.x > self.columns:
+            self.x -= self.columns
+            self.index()
+
+    def select_graphic_rendition(self, parameters):
+        if not parameters or parameters[0] == 0:
+            del self.sgr[:]
+            parameters = parameters[1:]
+        if parameters:
+            group = tuple(parameters)
+            if group in self.sgr:
+                self.sgr.remove(group)
+            self.sgr.append(group)
+            del self.sgr[:-8]
+
+    def carriage_return(self):
+        self.x = 0
+
+    def index(self):
+        self.y = min(self.y + 1, self.rows - 1)
+
+    def line_feed(self):
+        # the console shows received LF as new line
+        self.x = 0
+        self.index()
+
+    next_line = line_feed
+
+    def reverse_index(self):
+        self.positioned = True
+        self.y = max(self.y - 1, 0)
+
+    def backspace(self):
+        self.x = max(min(self.x, self.columns - 1) - 1, 0)
+
+    def horizontal_tab(self):
+        self.x = min(self.x + 8 - self.x % 8, self.columns - 1)
+
+    def cursor_up(self, count):
+        self.positioned = True
+        self.y = max(self.y - (count or 1), 0)
+
+    def cursor_down(self, count):
+        self.positioned = True
+        self.y = min(self.y + (count or 1), self.rows - 1)
+
+    def cursor_forward(self, count):
+        self.positioned = True
+        self.x = min(self.x + (count or 1), self.columns - 1)
+
+    def cursor_backward(self, count):
+        self.positioned = True
+        self.x = max(min(self.x, self.columns - 1) - (count or 1), 0)
+
+    def cursor_position(self, line, column):
+        self.positioned = True
+        self.y = min(max(line, 1), self.rows) - 1
+        self.x = min(max(column, 1), self.columns) - 1
+
+    def save_cursor(self):
+        self._saved = (self.x, self.y)
+
+    def restore_cursor(self):
+        self.positioned = True
+        self.x, self.y = self._saved
+
+
+class Scrollback(object):
+    """\
+    Bounded buffer of the most recently received bytes. A snapshot is only
+    the tail that is still visible on a screen: the last `lines` lines, or
+    less if the screen was cleared in between. It starts with the SGR
+    attributes and cursor position that were active where the tail begins
+    (see ScreenState), so that the client continues in the device's state.
+    """
+
+    def __init__(self, size=256 * 1024, lines=50, columns=80, rows=24):
+        self.size = size
+        self.lines = lines
+        self._buffer = bytearray()
+        # the state at the start of the buffer
+        self._state = ScreenState(columns, rows)
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        with self._lock:
+            self._buffer += data
+            # trim in larger steps so that appending stays cheap
+            if len(self._buffer) > 2 * self.size:
+                self._state.feed(bytes(self._buffer[:-self.size]))
+                del self._buffer[:-self.size]
+
+    def snapshot(self):
+        with self._lock:
+            buffer = self._buffer
+            start = len(buffer)
+            for _ in range(self.lines):
+                start = buffer.rfind(b'\n', 0, start)
+                if start < 0:
+                    break
+            start = max(start + 1, len(buffer) - self.size)
+            for sequence in CLEAR_SCREEN:
+                cleared = buffer.rfind(sequence, start)
+                if cleared >= 0:
+                    start = cleared
+            state = self._state.copy()
+            state.feed(bytes(buffer[:start]))
+            return state.sequence() + bytes(buffer[start:])
+
+
+def serve(serial_instance, name, scrollback_size=256 * 1024, lines=50, message=None):
+    """\
+    Keep the port open and share it with attached clients until interrupted.
+    Received data is stored in a scrollback buffer, new clients get a
+    snapshot of it before the live data. Messages go to `message`
+    (default: sys.stderr.write).
+    """
+    if message is None:
+        message = sys.stderr.write
+    path = socket_path(name)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    scrollback = Scrollback(scrollback_size, lines)
+    server = BridgeServer(
+        'unix:' + path,
+        write=serial_instance.write,
+        greeting=scrollback.snapshot,
+        record=scrollback.write,
+        message=lambda text: message(text.strip() + '\n'),
+        metrics_name='session')
+    os.chmod(path, 0o600)
+
+    def reader():
+        try:
+            while server.alive:
+                data = serial_instance.read(serial_instance.in_waiting or 1)
+                if data:
+                    server.broadcast(data)
+        except serial.SerialException as e:
+            message('--- port error: {} ---\n'.format(e))
+        finally:
+            server.close()
+
+    receiver_thread = threading.Thread(target=reader, name='rx')
+    receiver_thread.daemon = True
+    receiver_thread.start()
+    message('--- session {} on {}, attach with --attach {} ---\n'.format(name, serial_instance.port, name))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.close()
+    if hasattr(serial_instance, 'cancel_read'):
+        serial_instance.cancel_read()
+    receiver_thread.join()
+
+
+def _server_setting(name):
+    """\
+    Property for a port setting of SessionClient. The port is owned by the
+    session server, so these can not be read or changed by clients.
+    """
+    def unavailable(self, value=None):
+        raise serial.SerialException(
+            '{} is not available in an attached session, it is set by the --daemon process'.format(name))
+    return property(unavailable, unavailable)
+
+
+class SessionClient(object):
+    """\
+    Serial port like object that is connected to a session server, so that
+    Miniterm can be attached to it. Port settings and modem lines belong to
+    the server; using them raises SerialException.
+    """
+
+    baudrate = _server_setting('baudrate')
+    bytesize = _server_setting('bytesize')
+    parity = _server_setting('parity')
+    stopbits = _server_setting('stopbits')
+    xonxoff = _server_setting('xonxoff')
+    rtscts = _server_setting('rtscts')
+    rts = _server_setting('RTS')
+    dtr = _server_setting('DTR')
+    break_condition = _server_setting('BREAK')
+    cts = _server_setting('CTS')
+    dsr = _server_setting('DSR')
+    ri = _server_setting('RI')
+    cd = _server_setting('CD')
+
+    def __init__(self, name):
+        self.port = socket_path(name)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(self.port)
+        except OSError as e:
+            raise serial.SerialException('could not attach to session {!r}: {}'.format(name, e))
+        self._socket.settimeout(1)
+        self.is_open = True
+
+    @property
+    def name(self):
+        return self.port
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    @property
+    def timeout(self):
+        return self._socket.gettimeout()
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._socket.settimeout(timeout)
+
+    def read(self, size=1):
+        """return the data that is available (at least one byte, unless timed out)"""
+        try:
+            data = self._socket.recv(max(size, 4096))
+        except socket.timeout:
+            return b''
+        except OSError as e:
+            raise serial.SerialException('session connection failed: {}'.format(e))
+        if not data:
+            raise serial.SerialException('session closed')
+        return data
+
+    def write(self, data):
+        try:
+            self._socket.sendall(data)
+        except OSError as e:
+            raise serial.SerialException('session connection failed: {}'.format(e))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def getSettingsDict(self):
+        raise serial.SerialException('the port settings of an attached session can not be copied')
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self._socket.close()
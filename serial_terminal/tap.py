@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# Observe the data stream without slowing it down.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import collections
+import itertools
+import threading
+import time
+
+from . import metrics
+
+
+class Tap(object):
+    """\
+    Pass chunks of data to a callback in a thread of its own. The chunks
+    are read-only memoryviews of the data as it was read or written, no
+    copy is made. If the callback is slower than the data arrives, at most
+    `max_queue` bytes are kept and the oldest chunks are dropped.
+
+    Metrics: tap_NAME_queued_bytes, tap_NAME_dropped_bytes and tap_NAME_lag_ms
+    (age of the last chunk when the callback got it). NAME gets a number
+    appended, so that several taps with the same name do not collide.
+    """
+
+    _numbers = itertools.count(1)
+
+    def __init__(self, name, callback, max_queue=1 << 20, clock=time.time):
+        self.name = '{}_{}'.format(name, next(self._numbers))
+        self.callback = callback
+        self.clock = clock
+        self.max_queue = max_queue
+        self.queued = 0
+        self.dropped = 0
+        self.lag = 0.0
+        self.alive = True
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        metrics.register_gauge('tap_{}_queued_bytes'.format(self.name), lambda: self.queued)
+        metrics.register_gauge('tap_{}_dropped_bytes'.format(self.name), lambda: self.dropped)
+        metrics.register_gauge('tap_{}_lag_ms'.format(self.name), lambda: round(self.lag * 1e3, 3))
+        self.thread = threading.Thread(target=self.run, name='tap-{}'.format(self.name))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __call__(self, data):
+        """subscriber of a hook: queue data with the time from clock()"""
+        self.put(data, self.clock())
+
+    def put(self, data, timestamp):
+        """queue a chunk (bytes or a memoryview of immutable data), never blocks"""
+        view = memoryview(data).toreadonly()
+        with self._condition:
+            self._queue.append((view, timestamp))
+            self.queued += len(view)
+            while self.queued > self.max_queue:
+                dropped, _ = self._queue.popleft()
+                self.queued -= len(dropped)
+                self.dropped += len(dropped)
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self.alive and not self._queue:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                view, timestamp = self._queue.popleft()
+                self.queued -= len(view)
+            self.lag = time.time() - timestamp
+            try:
+                self.callback(view, timestamp)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+
+    def close(self, timeout=None):
+        """stop after the queued data was delivered"""
+        with self._condition:
+            self.alive = False
+            self._condition.notify()
+        if threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+        for kind in ('queued_bytes', 'dropped_bytes', 'lag_ms'):
+            metrics.unregister_gauge('tap_{}_{}'.format(self.name, kind))
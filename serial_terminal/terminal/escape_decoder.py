@@ -8,6 +8,10 @@
 #
 # SPDX-License-Identifier:    BSD-3-Clause
 
+import re
+
+from .. import metrics
+
 # C0 control codes
 NUL = b'\0'
 SOH = b'\x01'
@@ -78,9 +82,15 @@ PM = b'\x9E'
 APC = b'\x9F'
 
 
+# runs of bytes that handle_c0 passes unchanged to write()
+PRINTABLE_RUN = re.compile(b'[^\x00-\x1f\x7f]+')
+PRINTABLE_RUN_8BIT = re.compile(b'[^\x00-\x1f\x7f-\x9f]+')
+
+
 class EscapeDecoder:
-    def __init__(self, terminal_code_handler):
+    def __init__(self, terminal_code_handler, error_handler=None):
         self.terminal_code_handler = terminal_code_handler
+        self.error_handler = error_handler
         self._d_parameter = [0] * 3
         self._d_parameter_index = 0
         self._extra_flag = False
@@ -89,7 +99,8 @@ class EscapeDecoder:
         self.eightbit_controls = False
 
     def _reset_parameters(self):
-        self._d_parameter[0] = 0
+        # all of them, e.g. CUP with one parameter must not see an old column
+        self._d_parameter[:] = [0] * len(self._d_parameter)
         self._d_parameter_index = 0
         self._extra_flag = False
 
@@ -98,6 +109,40 @@ class EscapeDecoder:
         self._handler(character)
         # print(h.__name__, repr(character), self._handler.__name__)   # XXX
 
+    def feed(self, data):
+        """\
+        Handle a chunk of bytes. Outside of escape sequences, runs of printable
+        bytes are passed to write() at once instead of byte by byte. If an
+        error_handler is set, it is called with the exception when handling a
+        byte fails and processing continues with the next byte.
+        """
+        counters = metrics.thread_counters()
+        position = 0
+        end = len(data)
+        while position < end:
+            if self._handler == self.handle_c0:
+                run = (PRINTABLE_RUN_8BIT if self.eightbit_controls else PRINTABLE_RUN).match(data, position)
+                if run is not None:
+                    position = run.end()
+                    counters['decoder_text_runs'] += 1
+                    try:
+                        self.terminal_code_handler.write(run.group())
+                    except Exception as e:
+                        if self.error_handler is None:
+                            raise
+                        self.error_handler(e)
+                    continue
+                counters['decoder_controls'] += 1
+            else:
+                counters['decoder_sequence_bytes'] += 1
+            position += 1
+            try:
+                self._handler(data[position - 1:position])
+            except Exception as e:
+                if self.error_handler is None:
+                    raise
+                self.error_handler(e)
+
     def handle_c0(self, character):
         if character == NUL:
             pass
@@ -329,7 +374,7 @@ class EscapeDecoder:
         #~ elif character == b'"':  # sel character attribs, followed by b'q'
         #~ elif character == b'i':  # printing
         elif character == b';':          # parameter separator
-            if self._d_parameter_index < len(self._d_parameter):
+            if self._d_parameter_index < len(self._d_parameter) - 1:
                 self._d_parameter_index += 1
                 self._d_parameter[self._d_parameter_index] = 0
         elif character == b'?':          # ANSI private extensions marker
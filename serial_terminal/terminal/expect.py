@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Wait for patterns in the received data.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import re
+import threading
+import time
+
+
+class ExpectBuffer(object):
+    """\
+    Collect received data (fed from the reader thread) and let other threads
+    wait for patterns in it. Only the last `max_size` bytes are kept. Waiting
+    threads are woken up by a condition variable when new data arrives and
+    only search the new data plus `overlap` bytes before it.
+    """
+
+    def __init__(self, max_size=65536, overlap=1024):
+        self.max_size = max_size
+        self.overlap = overlap
+        self._buffer = bytearray()
+        # bytes removed from the front so far, positions are counted from
+        # the start of the stream so that each waiter knows what it searched
+        self._removed = 0
+        self._condition = threading.Condition()
+
+    def feed(self, data):
+        """add received data"""
+        with self._condition:
+            self._buffer += data
+            excess = len(self._buffer) - self.max_size
+            if excess > 0:
+                del self._buffer[:excess]
+                self._removed += excess
+            self._condition.notify_all()
+
+    def clear(self):
+        """forget all data received so far"""
+        with self._condition:
+            self._removed += len(self._buffer)
+            del self._buffer[:]
+
+    def expect(self, patterns, timeout=None):
+        """\
+        Wait until one of the patterns (bytes or compiled bytes regular
+        expressions, or a list of them) is found. Data up to the end of the
+        match is consumed. Return (index of the pattern, match object); the
+        match refers to a copy of the consumed data, so the data before it is
+        `match.string[:match.start()]`. Raise TimeoutError if nothing matched
+        within `timeout` seconds.
+        """
+        if not isinstance(patterns, (list, tuple)):
+            patterns = [patterns]
+        expressions = [p if hasattr(p, 'search') else re.compile(re.escape(p)) for p in patterns]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            searched = self._removed
+            while True:
+                start = max(0, searched - self._removed - self.overlap)
+                best = None
+                for index, expression in enumerate(expressions):
+                    match = expression.search(self._buffer, start)
+                    if match is not None and (best is None or match.start() < best[1].start()):
+                        best = (index, match)
+                searched = self._removed + len(self._buffer)
+                if best is not None:
+                    index, match = best
+                    # the match refers to the buffer, that is modified below
+                    snapshot = bytes(self._buffer[:match.end()])
+                    del self._buffer[:match.end()]
+                    self._removed += match.end()
+                    return index, expressions[index].search(snapshot, match.start())
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError('timeout waiting for {}'.format(
+                            ' or '.join(repr(e.pattern) for e in expressions)))
+                    self._condition.wait(remaining)
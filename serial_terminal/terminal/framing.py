@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+#
+# Split the received byte stream into frames.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Framers sit between the serial port reader and the decoder. feed() takes the
+chunks as returned by read() and returns a list of complete frames as
+memoryview objects. A frame that is contained in a single chunk is a slice
+of that chunk, only frames spanning several chunks (or frames that need to
+be unescaped) are copied.
+"""
+
+import abc
+import time
+
+
+class Framer(abc.ABC):
+    """Base class, collect data until a frame is complete"""
+
+    # if not None, the reader should call feed(b'', timestamp) at least every
+    # `idle_timeout` seconds, even if no data was received
+    idle_timeout = None
+
+    def __init__(self):
+        self._pending = []
+
+    def _frame(self, tail):
+        """combine pending data with the given (memoryview) tail to a frame"""
+        if len(self._pending) == 1 and not tail:
+            return self._pending.pop()
+        if self._pending:
+            self._pending.append(tail)
+            tail = memoryview(b''.join(self._pending))
+            del self._pending[:]
+        return tail
+
+    @abc.abstractmethod
+    def feed(self, data, timestamp=None):
+        """add received data, return a list of complete frames"""
+
+    def flush(self):
+        """return pending data as frame (or None)"""
+        if self._pending:
+            return self._frame(memoryview(b''))
+        return None
+
+
+class DelimiterFramer(Framer):
+    """Frames end with a delimiter byte, which is not part of the frame"""
+
+    def __init__(self, delimiter=b'\n'):
+        super(DelimiterFramer, self).__init__()
+        self.delimiter = delimiter
+
+    def feed(self, data, timestamp=None):
+        frames = []
+        if not data:
+            return frames
+        view = memoryview(data)
+        start = 0
+        position = data.find(self.delimiter)
+        while position >= 0:
+            frames.append(self._frame(view[start:position]))
+            start = position + 1
+            position = data.find(self.delimiter, start)
+        if start < len(data):
+            self._pending.append(view[start:])
+        return frames
+
+
+class FixedLengthFramer(Framer):
+    """Frames of fixed size"""
+
+    def __init__(self, length):
+        super(FixedLengthFramer, self).__init__()
+        if length < 1:
+            raise ValueError('frame length must be positive')
+        self.length = length
+        self._pending_size = 0
+
+    def feed(self, data, timestamp=None):
+        frames = []
+        if not data:
+            return frames
+        view = memoryview(data)
+        start = 0
+        if self._pending:
+            start = self.length - self._pending_size
+            if start > len(data):
+                self._pending.append(view)
+                self._pending_size += len(data)
+                return frames
+            frames.append(self._frame(view[:start]))
+        end = start + self.length
+        while end <= len(data):
+            frames.append(view[start:end])
+            start = end
+            end += self.length
+        if start < len(data):
+            self._pending.append(view[start:])
+        self._pending_size = len(data) - start
+        return frames
+
+
+class GapFramer(Framer):
+    """\
+    A frame ends when no data was received for `gap` seconds. The arrival
+    time is known per read() call, so the resolution is limited by the size
+    of the chunks the port delivers.
+    """
+
+    def __init__(self, gap):
+        super(GapFramer, self).__init__()
+        self.gap = gap
+        self.idle_timeout = gap
+        self._last = None
+
+    def feed(self, data, timestamp=None):
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        frames = []
+        if self._pending and timestamp - self._last >= self.gap:
+            frames.append(self._frame(memoryview(b'')))
+        if data:
+            self._pending.append(memoryview(data))
+            self._last = timestamp
+        return frames
+
+
+class SLIPFramer(DelimiterFramer):
+    """SLIP (RFC 1055) framing, frames are returned unescaped"""
+
+    END = b'\xc0'
+    ESC = 0xdb
+
+    def __init__(self):
+        super(SLIPFramer, self).__init__(self.END)
+
+    def feed(self, data, timestamp=None):
+        frames = []
+        for frame in super(SLIPFramer, self).feed(data, timestamp):
+            if not frame:
+                continue    # END is also sent at the start of packets
+            if self.ESC in frame:
+                frame = memoryview(frame.tobytes().replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb'))
+            frames.append(frame)
+        return frames
+
+
+def cobs_decode(data):
+    """decode a COBS encoded frame (without the zero delimiter)"""
+    out = bytearray()
+    position = 0
+    while position < len(data):
+        code = data[position]
+        if code == 0:
+            raise ValueError('zero byte in COBS frame')
+        out += data[position + 1:position + code]
+        position += code
+        if code < 0xff and position < len(data):
+            out.append(0)
+    return out
+
+
+class COBSFramer(DelimiterFramer):
+    """COBS framing, frames are separated by zero bytes and returned decoded"""
+
+    def __init__(self):
+        super(COBSFramer, self).__init__(b'\x00')
+
+    def feed(self, data, timestamp=None):
+        frames = []
+        for frame in super(COBSFramer, self).feed(data, timestamp):
+            if not frame:
+                continue
+            try:
+                frames.append(memoryview(cobs_decode(frame)))
+            except ValueError:
+                frames.append(frame)    # show broken frames as they are
+        return frames
+
+
+def framer_for_spec(spec):
+    """\
+    Create a framer from a command line specification:
+    gap:SECONDS, delimiter:BYTE (number or single character), length:BYTES,
+    slip or cobs.
+    """
+    name, _, value = spec.partition(':')
+    name = name.lower()
+    if name == 'gap':
+        return GapFramer(float(value))
+    elif name == 'delimiter':
+        if len(value) == 1:
+            return DelimiterFramer(value.encode('latin1'))
+        return DelimiterFramer(bytes([int(value, 0)]))
+    elif name == 'length':
+        return FixedLengthFramer(int(value, 0))
+    elif name == 'slip':
+        return SLIPFramer()
+    elif name == 'cobs':
+        return COBSFramer()
+    raise ValueError('unknown framing: {!r}'.format(spec))
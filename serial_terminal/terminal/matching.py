@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+#
+# Incremental matching of many patterns in a byte stream.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Literal patterns are compiled into one Aho-Corasick automaton (a dense DFA,
+one step per received byte independent of the number of patterns), regular
+expressions into one alternation. Expressions that do not work inside an
+alternation (group references, named groups, global flags) are matched on
+their own. All keep state across chunks, so matches spanning read()
+boundaries are found.
+"""
+
+import collections
+import re
+try:
+    from re import _parser as sre_parse     # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+def _first_bytes(pattern):
+    """\
+    Return the set of bytes that a match of a parsed regular expression can
+    start with, or None if that is not known (or it can match nothing).
+    """
+    first = set()
+    for op, av in pattern:
+        if op is sre_parse.AT:
+            continue                    # zero width
+        if op is sre_parse.LITERAL:
+            first.add(av)
+            return first
+        if op is sre_parse.IN:
+            for item_op, item_av in av:
+                if item_op is sre_parse.LITERAL:
+                    first.add(item_av)
+                elif item_op is sre_parse.RANGE:
+                    first.update(range(item_av[0], item_av[1] + 1))
+                else:
+                    return None         # negated sets, categories
+            return first
+        if op is sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, subpattern = av
+            if add_flags or del_flags:
+                return None
+            subpatterns, optional = [subpattern], subpattern.getwidth()[0] == 0
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            minimum, maximum, subpattern = av
+            subpatterns, optional = [subpattern], minimum == 0 or subpattern.getwidth()[0] == 0
+        elif op is sre_parse.BRANCH:
+            subpatterns = av[1]
+            optional = any(subpattern.getwidth()[0] == 0 for subpattern in subpatterns)
+        else:
+            return None
+        for subpattern in subpatterns:
+            subpattern_first = _first_bytes(subpattern)
+            if subpattern_first is None:
+                return None
+            first |= subpattern_first
+        if not optional:
+            return first
+    return None
+
+
+def _needs_own_expression(expression):
+    """\
+    Return True if a compiled expression can not be part of the alternation:
+    group numbers and names change there and global flags are not allowed.
+    """
+    if expression.flags or expression.groupindex:
+        return True
+    return _has_group_references(sre_parse.parse(expression.pattern))
+
+
+def _has_group_references(pattern):
+    """search a parsed regular expression for back references"""
+    for op, av in pattern:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return True
+        for value in av if isinstance(av, (tuple, list)) else ():
+            for subpattern in value if isinstance(value, list) else [value]:
+                if isinstance(subpattern, sre_parse.SubPattern) and _has_group_references(subpattern):
+                    return True
+    return False
+
+
+class AhoCorasick(object):
+    """Find all occurrences of a set of byte strings"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        outputs = [[]]
+        for n, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError('empty pattern')
+            state = 0
+            for byte in pattern:
+                if byte not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][byte] = len(goto) - 1
+                state = goto[state][byte]
+            outputs[state].append(n)
+        # build the complete transition table, states are stored as
+        # offsets (state * 256) so that a step is a single list lookup
+        fail = [0] * len(goto)
+        delta = [0] * (len(goto) * 256)
+        queue = collections.deque()
+        for byte, target in goto[0].items():
+            delta[byte] = target * 256
+            queue.append(target)
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            base = state * 256
+            fail_base = fail[state] * 256
+            for byte in range(256):
+                target = goto[state].get(byte)
+                if target is None:
+                    delta[base + byte] = delta[fail_base + byte]
+                else:
+                    fail[target] = delta[fail_base + byte] // 256
+                    delta[base + byte] = target * 256
+                    queue.append(target)
+        self._delta = delta
+        self._outputs = [None] * len(delta)
+        for state, output in enumerate(outputs):
+            if output:
+                self._outputs[state * 256] = output
+        self._state = 0
+
+    def reset(self):
+        self._state = 0
+
+    def feed(self, data):
+        """\
+        Process a chunk, return a list of (pattern index, end position) where
+        the end position is relative to the start of this chunk and may be
+        smaller than the pattern length if the match started in an earlier
+        chunk.
+        """
+        matches = []
+        delta = self._delta
+        outputs = self._outputs
+        state = self._state
+        for position, byte in enumerate(data):
+            state = delta[state + byte]
+            if outputs[state] is not None:
+                for n in outputs[state]:
+                    matches.append((n, position + 1))
+        self._state = state
+        return matches
+
+
+class StreamExpression(object):
+    """\
+    A compiled regular expression that is matched against the new data plus
+    a carry-over of previous data. The carry-over starts at the first byte
+    that could still begin a match and is shorter than the longest possible
+    match, but at most `max_carry` bytes, so a match of an unbounded
+    expression can not be longer than that.
+    """
+
+    def __init__(self, expression, max_carry=1024):
+        self.expression = expression
+        # only a match that ends in the new data is reported, so bytes
+        # further back than the longest match can never be part of one
+        parsed = sre_parse.parse(expression.pattern, expression.flags)
+        self._carry_size = max(0, min(parsed.getwidth()[1] - 1, max_carry))
+        # and the carry-over can start where a match could start
+        first = None if parsed.state.flags & re.IGNORECASE else _first_bytes(parsed)
+        if first:
+            self._start = re.compile(b'[' + b''.join(re.escape(bytes([b])) for b in sorted(first)) + b']')
+        else:
+            self._start = None
+        self._carry = b''
+        # the byte before the carry-over, context for \b and lookbehinds
+        self._before = b''
+
+    def reset(self):
+        self._carry = b''
+        self._before = b''
+
+    def feed(self, data):
+        """\
+        Process a chunk, return a list of (end position, match object) where
+        the end position is relative to the start of this chunk.
+        """
+        matches = []
+        buffer = self._before + self._carry + bytes(data)
+        skip = len(self._before) + len(self._carry)
+        last_end = 0
+        for match in self.expression.finditer(buffer, len(self._before)):
+            if match.end() > skip:
+                matches.append((match.end() - skip, match))
+                last_end = match.end()
+        # keep the tail for matches crossing the chunk border, but not
+        # what was already matched
+        start = max(last_end, len(buffer) - self._carry_size)
+        if self._start is not None:
+            first = self._start.search(buffer, start)
+            start = first.start() if first is not None else len(buffer)
+        self._before = buffer[start - 1:start] if start else b''
+        self._carry = buffer[start:]
+        return matches
+
+
+class MultiMatcher(object):
+    """\
+    Match literal and regular expression patterns (both bytes) in a stream,
+    see StreamExpression for the limits of regular expression matches.
+    """
+
+    def __init__(self, literals=(), expressions=(), max_carry=1024):
+        self.literals = list(literals)
+        self.expressions = list(expressions)
+        self.max_carry = max_carry
+        self._literal_matcher = AhoCorasick(self.literals) if self.literals else None
+        # (StreamExpression, pattern index or None if the index is the group name)
+        self._expressions = []
+        combined = []
+        for n, pattern in enumerate(self.expressions):
+            try:
+                expression = re.compile(pattern)
+            except re.error as e:
+                raise ValueError('regular expression {!r}: {}'.format(pattern, e))
+            if _needs_own_expression(expression):
+                self._expressions.append((StreamExpression(expression, max_carry), n))
+            else:
+                combined.append(b'(?P<_m' + str(n).encode('ascii') + b'>' + pattern + b')')
+        if combined:
+            self._expressions.append((StreamExpression(re.compile(b'|'.join(combined)), max_carry), None))
+
+    def reset(self):
+        if self._literal_matcher is not None:
+            self._literal_matcher.reset()
+        for expression, n in self._expressions:
+            expression.reset()
+
+    def feed(self, data):
+        """\
+        Process a chunk, return a list of (kind, index, matched bytes) where
+        kind is 'literal' or 'regex' and index refers to the pattern list.
+        The matches are sorted by their end in the stream.
+        """
+        matches = []
+        if self._literal_matcher is not None:
+            for n, end in self._literal_matcher.feed(data):
+                matches.append((end, 'literal', n, self.literals[n]))
+        for expression, n in self._expressions:
+            for end, match in expression.feed(data):
+                matches.append((end, 'regex', int(match.lastgroup[2:]) if n is None else n, match.group()))
+        # stable: literals ending at the same byte stay in DFA order
+        matches.sort(key=lambda match: match[0])
+        return [match[1:] for match in matches]
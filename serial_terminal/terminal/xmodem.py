@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+#
+# XMODEM and YMODEM file transfer.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+XMODEM (checksum, CRC and 1K blocks) and YMODEM batch transfers. The port
+is expected to be used exclusively during a transfer (the terminal pauses
+its reader). Packets are assembled in a preallocated buffer and data is
+passed around as memoryview slices.
+"""
+
+import binascii
+import os
+import time
+
+SOH = 0x01
+STX = 0x02
+EOT = 0x04
+ACK = 0x06
+NAK = 0x15
+CAN = 0x18
+CRC = 0x43  # 'C'
+SUB = 0x1A
+
+# CRC-16/XMODEM, binascii implements it table driven in C
+crc16 = binascii.crc_hqx
+
+
+class TransferError(Exception):
+    """transfer was aborted or failed"""
+
+
+class XModem(object):
+    """\
+    XMODEM sender and receiver. `serial_instance` needs read(), write() and a
+    settable timeout. progress(position, total) is called after each block,
+    total may be None if unknown.
+    """
+
+    def __init__(self, serial_instance, block_size=128, use_crc=True, retries=10, timeout=10,
+                 progress=None):
+        if block_size not in (128, 1024):
+            raise ValueError('block size must be 128 or 1024')
+        self.serial = serial_instance
+        self.block_size = block_size
+        self.use_crc = use_crc
+        self.retries = retries
+        self.timeout = timeout
+        self.progress = progress
+        # header, block number, complement, data, crc
+        self._packet = bytearray(3 + 1024 + 2)
+        self._receive_buffer = bytearray(2 + 1024 + 2)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # helpers
+
+    def _read_byte(self, timeout):
+        self.serial.timeout = timeout
+        data = self.serial.read(1)
+        return data[0] if data else None
+
+    def _read_into(self, view):
+        """fill the view, return False on timeout"""
+        position = 0
+        while position < len(view):
+            n = self.serial.readinto(view[position:])
+            if not n:
+                return False
+            position += n
+        return True
+
+    def _purge(self):
+        """discard incoming data until the line is quiet"""
+        self.serial.timeout = 0.1
+        while self.serial.read(1024):
+            pass
+
+    def cancel(self):
+        self.serial.write(bytes([CAN] * 8))
+
+    def _wait_for(self, expected, timeout):
+        """wait for one of the expected bytes, return it (or None on timeout)"""
+        deadline = time.monotonic() + timeout
+        cancel_count = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            byte = self._read_byte(remaining)
+            if byte in expected:
+                return byte
+            if byte == CAN:
+                cancel_count += 1
+                if cancel_count >= 2:
+                    raise TransferError('canceled by remote')
+            else:
+                cancel_count = 0
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # send
+
+    def _send_packet(self, number, data, use_crc, block_size, padding=SUB):
+        """send one packet with retries, data is padded to the block size"""
+        packet = self._packet
+        packet[0] = STX if block_size == 1024 else SOH
+        packet[1] = number & 0xff
+        packet[2] = 0xff - (number & 0xff)
+        packet[3:3 + len(data)] = data
+        packet[3 + len(data):3 + block_size] = bytes([padding]) * (block_size - len(data))
+        end = 3 + block_size
+        if use_crc:
+            crc = crc16(memoryview(packet)[3:end], 0)
+            packet[end] = crc >> 8
+            packet[end + 1] = crc & 0xff
+            end += 2
+        else:
+            packet[end] = sum(memoryview(packet)[3:end]) & 0xff
+            end += 1
+        view = memoryview(packet)[:end]
+        for attempt in range(self.retries):
+            self.serial.write(view)
+            answer = self._wait_for((ACK, NAK), self.timeout)
+            if answer == ACK:
+                return
+        self.cancel()
+        raise TransferError('no acknowledge for block {}'.format(number))
+
+    def _wait_for_start(self):
+        """wait for the receiver to request the transfer, return True for CRC mode"""
+        answer = self._wait_for((CRC, NAK), self.timeout * self.retries)
+        if answer is None:
+            raise TransferError('receiver did not start')
+        return answer == CRC
+
+    def _send_eot(self):
+        for attempt in range(self.retries):
+            self.serial.write(bytes([EOT]))
+            if self._wait_for((ACK, NAK), self.timeout) == ACK:
+                return
+        raise TransferError('end of transmission not acknowledged')
+
+    def _send_data(self, view, use_crc, first_block=1, total=None):
+        number = first_block
+        position = 0
+        while position < len(view):
+            size = self.block_size if len(view) - position > 128 else 128
+            block = view[position:position + size]
+            self._send_packet(number, block, use_crc, size)
+            position += len(block)
+            number += 1
+            if self.progress is not None:
+                self.progress(position, total if total is not None else len(view))
+        self._send_eot()
+
+    def _send_stream(self, f, use_crc, total=None):
+        """like _send_data, but read the blocks from a binary file like object"""
+        number = 1
+        position = 0
+        view = memoryview(bytearray(self.block_size))
+        while True:
+            # fill a whole block, files may return short reads
+            length = 0
+            while length < self.block_size:
+                n = f.readinto(view[length:])
+                if not n:
+                    break
+                length += n
+            if not length:
+                break
+            self._send_packet(number, view[:length], use_crc, self.block_size if length > 128 else 128)
+            position += length
+            number += 1
+            if self.progress is not None:
+                self.progress(position, total)
+        self._send_eot()
+
+    def send(self, data):
+        """send bytes like data (e.g. a memoryview on a mmap)"""
+        use_crc = self._wait_for_start() and self.use_crc
+        self._send_data(memoryview(data), use_crc)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # receive
+
+    def _receive_packet(self, header, use_crc):
+        """\
+        Read the rest of a packet after the header byte. Return (number, data
+        view) or None if it was damaged.
+        """
+        size = 1024 if header == STX else 128
+        length = 2 + size + (2 if use_crc else 1)
+        view = memoryview(self._receive_buffer)[:length]
+        self.serial.timeout = self.timeout
+        if not self._read_into(view):
+            return None
+        number, complement = view[0], view[1]
+        data = view[2:2 + size]
+        if number != 0xff - complement:
+            return None
+        if use_crc:
+            if crc16(data, 0) != (view[2 + size] << 8) | view[3 + size]:
+                return None
+        elif sum(data) & 0xff != view[2 + size]:
+            return None
+        return number, data
+
+    def _start_receive(self, use_crc):
+        """request the transfer, return (header, use_crc)"""
+        for attempt in range(self.retries):
+            # fall back to checksum mode after some tries
+            if use_crc and attempt >= self.retries // 2:
+                use_crc = False
+            self.serial.write(bytes([CRC if use_crc else NAK]))
+            header = self._wait_for((SOH, STX, EOT), 3)
+            if header is not None:
+                return header, use_crc
+        raise TransferError('sender did not start')
+
+    def _receive_data(self, output, use_crc, header=None, expected=1):
+        """receive blocks until EOT, write them to output, return byte count"""
+        if header is None:
+            header, use_crc = self._start_receive(use_crc)
+        count = 0
+        errors = 0
+        while True:
+            if header == EOT:
+                self.serial.write(bytes([ACK]))
+                return count
+            if header in (SOH, STX):
+                packet = self._receive_packet(header, use_crc)
+            else:
+                packet = None
+            if packet is None:
+                errors += 1
+                if errors > self.retries:
+                    self.cancel()
+                    raise TransferError('too many errors')
+                self._purge()
+                self.serial.write(bytes([NAK]))
+            else:
+                number, data = packet
+                if number == expected & 0xff:
+                    output.write(data)
+                    count += len(data)
+                    expected += 1
+                    errors = 0
+                    if self.progress is not None:
+                        self.progress(count, None)
+                elif number != (expected - 1) & 0xff:
+                    # neither the next block nor a repeated one, blocks are missing
+                    self.cancel()
+                    raise TransferError('block {} out of sequence, expected {}'.format(number, expected & 0xff))
+                # duplicates (ACK was lost) are acknowledged and dropped
+                self.serial.write(bytes([ACK]))
+            header = self._wait_for((SOH, STX, EOT), self.timeout)
+            if header is None:
+                self.cancel()
+                raise TransferError('timeout')
+
+    def receive(self, output):
+        """receive into a binary file like object, return byte count (incl. padding)"""
+        return self._receive_data(output, self.use_crc)
+
+
+class YModem(XModem):
+    """YMODEM batch transfer, always with CRC and 1K blocks"""
+
+    def __init__(self, serial_instance, **kwargs):
+        kwargs['block_size'] = 1024
+        kwargs['use_crc'] = True
+        super(YModem, self).__init__(serial_instance, **kwargs)
+
+    def send(self, filenames):
+        """send a list of files"""
+        for filename in filenames:
+            with open(filename, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                self._wait_for_start()
+                header = '{}\0{} {:o}'.format(os.path.basename(filename), size, 0).encode('utf-8')
+                self._send_packet(0, header, True, 128 if len(header) <= 128 else 1024, padding=0)
+                self._wait_for_start()
+                self._send_stream(f, True, total=size)
+        # an empty block 0 ends the batch
+        self._wait_for_start()
+        self._send_packet(0, b'', True, 128, padding=0)
+
+    def receive(self, directory):
+        """receive files into directory, return list of filenames"""
+        filenames = []
+        while True:
+            header, use_crc = self._start_receive(True)
+            if header not in (SOH, STX):
+                raise TransferError('expected file header')
+            packet = self._receive_packet(header, True)
+            if packet is None or packet[0] != 0:
+                self.cancel()
+                raise TransferError('bad file header')
+            name, _, info = bytes(packet[1]).partition(b'\0')
+            if not name:
+                self.serial.write(bytes([ACK]))
+                return filenames
+            size = int(info.split(b'\0')[0].split()[0]) if info.strip(b'\0') else None
+            self.serial.write(bytes([ACK]))
+            filename = os.path.join(directory, os.path.basename(name.decode('utf-8', 'replace')))
+            with open(filename, 'wb') as f:
+                self._receive_data(f, True)
+                if size is not None:
+                    f.truncate(size)    # remove padding
+            filenames.append(filename)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# Simulated devices on pseudo terminals, for tests.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+"""\
+Each device runs in a thread on the master side of a pseudo terminal, the
+terminal opens `device.port`. close() stops the thread and closes the file
+descriptors. Run as script for an echo device to try --echo-latency with.
+"""
+
+import os
+import pathlib
+import pty
+import random
+import select
+import sys
+import termios
+import threading
+import time
+import tty
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.features.auto_baud import FRAMING_SUSPECTS, STANDARD_RATES  # noqa: E402
+
+
+class PtyDevice(object):
+    """base class, subclasses implement poll()"""
+
+    def __init__(self, name):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.alive = True
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        try:
+            while self.alive:
+                self.poll()
+        except OSError:
+            pass
+
+    def poll(self):
+        """do one step, return within some 0.1 seconds"""
+        raise NotImplementedError
+
+    def close(self):
+        self.alive = False
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+class SimulatedDevice(PtyDevice):
+    """\
+    Behave like a device sending text at baudrate: at other settings of the
+    port, it sends noise like a UART at the wrong speed.
+    """
+
+    def __init__(self, baudrate, message=b'U-Boot 2018.03 (Mar 01 2018)\r\nHit any key to stop autoboot\r\n=> ',
+                 interval=0.02):
+        self.baudrate = baudrate
+        self.message = message
+        self.interval = interval
+        self.speeds = {getattr(termios, 'B{}'.format(rate)): rate
+                       for rate in STANDARD_RATES + (300, 600) if hasattr(termios, 'B{}'.format(rate))}
+        self._random = random.Random(0)
+        self._noise = bytes(FRAMING_SUSPECTS) + bytes(range(256))
+        self._position = 0
+        super(SimulatedDevice, self).__init__('simulated-device')
+
+    def poll(self):
+        # master and slave share the terminal settings
+        current = self.speeds.get(termios.tcgetattr(self.master)[5])
+        if current == self.baudrate:
+            chunk = self.message[self._position:self._position + 8]
+            self._position = (self._position + 8) % len(self.message)
+        else:
+            chunk = bytes(self._random.choice(self._noise) for _ in range(8))
+        os.write(self.master, chunk)
+        time.sleep(self.interval)
+
+
+class EchoDevice(PtyDevice):
+    """echo everything after delay seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        super(EchoDevice, self).__init__('echo-device')
+
+    def poll(self):
+        readable, _, _ = select.select([self.master], [], [], 0.1)
+        if readable:
+            data = os.read(self.master, 4096)
+            if self.delay:
+                time.sleep(self.delay)
+            os.write(self.master, data)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Pseudo terminal that echoes all data, for latency tests.')
+    parser.add_argument('--delay', type=float, default=0.0, help='echo delay in seconds, default: %(default)s')
+    args = parser.parse_args()
+    with EchoDevice(args.delay) as device:
+        print('--- echo device on {} (Ctrl+C to quit) ---'.format(device.port))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Test baud rate detection against a simulated device on a pseudo terminal.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import os
+import pathlib
+import sys
+import unittest
+
+import serial
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.features import auto_baud  # noqa: E402
+
+if os.name == 'posix':
+    from pty_devices import SimulatedDevice
+
+
+class DummyMiniterm(object):
+    """the parts of Miniterm that AutoBaud uses"""
+
+    console = None
+
+    def __init__(self, serial_instance):
+        self.serial = serial_instance
+        self.messages = []
+        self.reader_running = True
+
+    def _stop_reader(self):
+        self.reader_running = False
+
+    def _start_reader(self):
+        self.reader_running = True
+
+
+class TestScore(unittest.TestCase):
+
+    def test_text(self):
+        self.assertEqual(auto_baud.score(b'hello world\r\n'), 1.0)
+        self.assertEqual(auto_baud.score('Grüße'.encode('utf-8')), 1.0)
+
+    def test_noise(self):
+        self.assertLess(auto_baud.score(b'\x00\xff\xf0\xe0\x80\xfe'), 0.0)
+
+    def test_empty(self):
+        self.assertIsNone(auto_baud.score(b''))
+
+
+@unittest.skipUnless(os.name == 'posix', 'needs a pseudo terminal')
+class TestDetection(unittest.TestCase):
+
+    def setUp(self):
+        self.device = SimulatedDevice(38400)
+        self.serial = serial.Serial(self.device.port, 115200)
+        self.miniterm = DummyMiniterm(self.serial)
+        self.auto_baud = auto_baud.AutoBaud(self.miniterm, budget=3.0)
+        self.auto_baud.message = self.miniterm.messages.append
+
+    def tearDown(self):
+        self.serial.close()
+        self.device.close()
+
+    def test_detect(self):
+        rate, results = self.auto_baud.detect()
+        self.assertEqual(rate, 38400)
+        # stops at the first clean result
+        self.assertEqual(results[-1][0], 38400)
+
+    def test_execute(self):
+        self.auto_baud.execute()
+        self.assertEqual(self.serial.baudrate, 38400)
+        self.assertTrue(self.miniterm.reader_running)
+        self.assertIn('--- baud rate set to 38400 ---\n', self.miniterm.messages)
+
+    def test_error_restarts_reader(self):
+        def fail():
+            raise serial.SerialException('gone')
+        self.auto_baud.detect = fail
+        self.auto_baud.execute()
+        self.assertEqual(self.serial.baudrate, 115200)
+        self.assertTrue(self.miniterm.reader_running)
+        self.assertIn('--- ERROR detecting baud rate: gone ---\n', self.miniterm.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Test XMODEM and YMODEM transfers over a pseudo terminal loopback.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import io
+import os
+import pathlib
+import select
+import sys
+import tempfile
+import threading
+import unittest
+
+import serial
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.terminal import xmodem  # noqa: E402
+
+
+class MasterPort(object):
+    """the parts of a serial port that the protocols use, on the pty master"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.timeout = 1
+
+    def read(self, size=1):
+        ready, _, _ = select.select([self.fd], [], [], self.timeout)
+        return os.read(self.fd, size) if ready else b''
+
+    def readinto(self, view):
+        data = self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        return os.write(self.fd, bytes(data))
+
+
+@unittest.skipUnless(os.name == 'posix', 'needs a pseudo terminal')
+class TestTransfer(unittest.TestCase):
+
+    # not a multiple of the block sizes, so that the last block is padded
+    payload = bytes(range(256)) * 20 + b'end'
+
+    def setUp(self):
+        import tty
+        master, slave = os.openpty()
+        tty.setraw(master)
+        self.addCleanup(os.close, master)
+        self.sender = serial.Serial(os.ttyname(slave), timeout=1)
+        os.close(slave)
+        self.receiver = MasterPort(master)
+
+    def tearDown(self):
+        self.sender.close()
+
+    def run_receiver(self, function, *args):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(function(*args)))
+        thread.daemon = True
+        thread.start()
+        return thread, result
+
+    def xmodem(self, **kwargs):
+        output = io.BytesIO()
+        thread, result = self.run_receiver(xmodem.XModem(self.receiver, **kwargs).receive, output)
+        progress = []
+        xmodem.XModem(self.sender, progress=lambda *args: progress.append(args), **kwargs).send(self.payload)
+        thread.join(10)
+        self.assertEqual(output.getvalue().rstrip(bytes([xmodem.SUB])), self.payload)
+        self.assertEqual(result, [len(output.getvalue())])
+        self.assertEqual(progress[-1], (len(self.payload), len(self.payload)))
+
+    def test_checksum(self):
+        self.xmodem(block_size=128, use_crc=False)
+
+    def test_crc(self):
+        self.xmodem(block_size=128)
+
+    def test_1k(self):
+        self.xmodem(block_size=1024)
+
+    def test_out_of_sequence(self):
+        errors = []
+
+        def receive():
+            try:
+                xmodem.XModem(self.receiver, timeout=1).receive(io.BytesIO())
+            except xmodem.TransferError as e:
+                errors.append(e)
+        thread = threading.Thread(target=receive)
+        thread.daemon = True
+        thread.start()
+        sender = xmodem.XModem(self.sender, timeout=1, retries=1)
+        use_crc = sender._wait_for_start()
+        sender._send_packet(1, b'first', use_crc, 128)
+        # block 2 is skipped, the receiver has to cancel
+        with self.assertRaises(xmodem.TransferError):
+            sender._send_packet(3, b'third', use_crc, 128)
+        thread.join(10)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('out of sequence', str(errors[0]))
+
+    def test_ymodem_batch(self):
+        source = tempfile.mkdtemp()
+        destination = tempfile.mkdtemp()
+        contents = {'a.bin': self.payload, 'b.txt': b'hello\n', 'empty': b''}
+        filenames = []
+        for name, data in sorted(contents.items()):
+            filenames.append(os.path.join(source, name))
+            with open(filenames[-1], 'wb') as f:
+                f.write(data)
+        thread, result = self.run_receiver(xmodem.YModem(self.receiver).receive, destination)
+        xmodem.YModem(self.sender).send(filenames)
+        thread.join(10)
+        self.assertEqual(result, [[os.path.join(destination, name) for name in sorted(contents)]])
+        for name, data in contents.items():
+            with open(os.path.join(destination, name), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Test matching of literal and regular expression patterns across chunks.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import pathlib
+import sys
+import unittest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.terminal.matching import MultiMatcher  # noqa: E402
+
+
+def feed_bytewise(matcher, data):
+    matches = []
+    for n in range(len(data)):
+        matches.extend(matcher.feed(data[n:n + 1]))
+    return matches
+
+
+class TestMultiMatcher(unittest.TestCase):
+
+    def test_across_chunks(self):
+        matcher = MultiMatcher([b'panic'], [br'ERR\d{3}'])
+        self.assertEqual(
+            feed_bytewise(matcher, b'xx ERR123 kernel panic ERR9 ERR456'),
+            [('regex', 0, b'ERR123'), ('literal', 0, b'panic'), ('regex', 0, b'ERR456')])
+
+    def test_stream_order(self):
+        matcher = MultiMatcher([b'lit', b'end'], [b'a+b', b'x.y'])
+        self.assertEqual(
+            matcher.feed(b'aab lit xzy end'),
+            [('regex', 0, b'aab'), ('literal', 0, b'lit'), ('regex', 1, b'xzy'), ('literal', 1, b'end')])
+
+    def test_backreference(self):
+        matcher = MultiMatcher(expressions=[br'x\d', br'(a)\1', br'(?P<c>b)(?P=c)'])
+        self.assertEqual(
+            feed_bytewise(matcher, b'ab aa bb x1'),
+            [('regex', 1, b'aa'), ('regex', 2, b'bb'), ('regex', 0, b'x1')])
+
+    def test_global_flags(self):
+        matcher = MultiMatcher(expressions=[b'(?i)abc', b'def'])
+        self.assertEqual(
+            feed_bytewise(matcher, b'ABC def DEF aBc'),
+            [('regex', 0, b'ABC'), ('regex', 1, b'def'), ('regex', 0, b'aBc')])
+
+    def test_invalid_expression(self):
+        with self.assertRaises(ValueError):
+            MultiMatcher(expressions=[b'ok', b'(unclosed'])
+
+    def test_word_boundary(self):
+        matcher = MultiMatcher(expressions=[br'\bfoo'])
+        self.assertEqual(feed_bytewise(matcher, b'xfoo foo'), [('regex', 0, b'foo')])
+
+
+if __name__ == '__main__':
+    unittest.main()
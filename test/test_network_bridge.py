@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#
+# Test the network bridge with clients on local sockets.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import pathlib
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.features.network_bridge import BridgeServer  # noqa: E402
+
+
+class TestBridgeServer(unittest.TestCase):
+
+    def start(self, **kwargs):
+        self.messages = []
+        self.bridge = BridgeServer('127.0.0.1:0', message=self.messages.append, **kwargs)
+        self.thread = threading.Thread(target=self.bridge.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.addCleanup(self.thread.join, 5)
+        self.addCleanup(self.bridge.close)
+
+    def connect(self, receive_buffer=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if receive_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        sock.connect(self.bridge.server.getsockname())
+        sock.settimeout(5)
+        self.addCleanup(sock.close)
+        self.wait_for(lambda: len(self.bridge.clients) == self.expected_clients + 1)
+        self.expected_clients += 1
+        return sock
+
+    expected_clients = 0
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timeout')
+            time.sleep(0.01)
+
+    def receive(self, sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_fan_out(self):
+        self.start()
+        clients = [self.connect() for _ in range(3)]
+        self.bridge.broadcast(b'hello ')
+        self.bridge.broadcast(memoryview(b'world'))
+        for sock in clients:
+            self.assertEqual(self.receive(sock, 11), b'hello world')
+
+    def test_read_only(self):
+        self.start()
+        sock = self.connect()
+        sock.sendall(b'ignored')
+        self.bridge.broadcast(b'data')
+        self.assertEqual(self.receive(sock, 4), b'data')
+        # the input was read and dropped, the client is still connected
+        self.assertEqual(len(self.bridge.clients), 1)
+
+    def test_read_write(self):
+        received = []
+        self.start(write=received.append)
+        first = self.connect()
+        second = self.connect()
+        first.sendall(b'from first')
+        second.sendall(b'from second')
+        self.wait_for(lambda: len(b''.join(received)) == 21)
+        self.assertEqual(sorted(received), [b'from first', b'from second'])
+
+    def fill(self, sock, chunk=b'x' * 65536, count=256):
+        """\
+        Broadcast until the bridge gave up on the (not reading) client, return
+        the number of bytes sent.
+        """
+        for n in range(1, count + 1):
+            self.bridge.broadcast(chunk)
+            time.sleep(0.001)
+            client = self.bridge.clients.get(self.server_side(sock))
+            if client is None or client.dropped:
+                break
+        return n * len(chunk)
+
+    def server_side(self, sock):
+        for server_sock in list(self.bridge.clients):
+            if server_sock.getpeername() == sock.getsockname():
+                return server_sock
+        return None
+
+    def test_drop_slow_client(self):
+        self.start(max_queue=65536, drop_policy='drop')
+        fast = self.connect()
+        slow = self.connect(receive_buffer=4096)
+        server_sock = self.server_side(slow)
+        client = self.bridge.clients[server_sock]
+        received = bytearray()
+
+        def read_until_end():
+            while not received.endswith(b'end'):
+                received.extend(fast.recv(65536))
+        reader = threading.Thread(target=read_until_end)
+        reader.daemon = True
+        reader.start()
+        size = self.fill(slow)
+        self.assertGreater(client.dropped, 0)
+        self.assertLessEqual(client.queued, 65536 + len(client.pending))
+        # the slow client stays connected and the fast one gets everything
+        self.assertIn(server_sock, self.bridge.clients)
+        self.bridge.broadcast(b'end')
+        reader.join(30)
+        self.assertEqual(len(received), size + 3)
+
+    def test_disconnect_slow_client(self):
+        self.start(max_queue=65536, drop_policy='disconnect')
+        slow = self.connect(receive_buffer=4096)
+        self.fill(slow)
+        self.wait_for(lambda: not self.bridge.clients)
+        self.wait_for(lambda: any('too slow' in message for message in self.messages))
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            BridgeServer('127.0.0.1:0', drop_policy='wait')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+# Test the scrollback snapshots of detachable sessions.
+#
+# This file is part of pySerial-terminal. https://github.com/pyserial/pyserial-terminal
+# (C) 2018 Chris Liechti <cliechti@gmx.net>
+#
+# SPDX-License-Identifier:    BSD-3-Clause
+
+import pathlib
+import sys
+import unittest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from serial_terminal.session import Scrollback  # noqa: E402
+
+
+class TestScrollback(unittest.TestCase):
+
+    def test_lines(self):
+        scrollback = Scrollback(lines=2)
+        scrollback.write(b'one\ntwo\nthree\nfour')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0mthree\nfour')
+
+    def test_sgr_before_tail(self):
+        scrollback = Scrollback(lines=1)
+        scrollback.write(b'\x1b[1m\x1b[33mwarning\n\x1b[4mend\nlast')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0m\x1b[1;33;4mlast')
+
+    def test_sgr_reset(self):
+        scrollback = Scrollback(lines=1)
+        scrollback.write(b'\x1b[1mbold\x1b[0m\nplain')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0mplain')
+
+    def test_cursor_position(self):
+        scrollback = Scrollback(lines=1)
+        scrollback.write(b'\x1b[5;10Habc\x1b[2Bdef\nmenu')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0m\x1b[8;1Hmenu')
+
+    def test_clear_screen(self):
+        scrollback = Scrollback()
+        scrollback.write(b'old\n\x1b[31m\x1b[3;4H\x1b[2Jnew')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0m\x1b[31m\x1b[3;4H\x1b[2Jnew')
+
+    def test_trimmed(self):
+        scrollback = Scrollback(size=16, lines=1)
+        scrollback.write(b'\x1b[7m' + b'x' * 40 + b'\n')
+        scrollback.write(b'y' * 40 + b'\nz')
+        self.assertEqual(scrollback.snapshot(), b'\x1b[0m\x1b[7mz')
+
+
+if __name__ == '__main__':
+    unittest.main()